@@ -0,0 +1,81 @@
+"""Retained memory per instance of a small class.
+
+Creates N instances of `class Point { init(x, y) { this.x = x; this.y = y; } }`
+by calling the class through the interpreter and reports the bytes each one
+keeps alive, measured with tracemalloc. The old layout, a per-instance
+fields dict, is rebuilt here for comparison.
+
+    python bench/bench_instance_memory.py [count]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "pynut"))
+
+from utils import Context
+from nutlexer import Lexer
+from nutparser import Parser
+from nutastinterpreter import Interpreter
+from nutresolver import Resolver
+
+SOURCE = "class Point { init(x, y) { this.x = x; this.y = y; } }"
+
+
+class DictInstance:
+    """NutInstance before shapes: every instance owns a dict of its fields."""
+
+    def __init__(self, _class) -> None:
+        self._class = _class
+        self.fields = {}
+
+    def set(self, name, value) -> None:
+        self.fields[name] = value
+
+
+def point_class(interpreter: Interpreter):
+    context = interpreter.context
+    statements = Parser(Lexer(context).tokenize(), context).parse()
+    Resolver(interpreter).resolve(statements)
+    interpreter.interpret(statements)
+    return interpreter.globals.get("Point")
+
+
+def measure(make, count: int) -> float:
+    # coordinates are created up front so only the instances are counted
+    coords = [(float(i), float(-i)) for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [make(x, y) for x, y in coords]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # the list holding the instances is not part of their cost
+    return (after - before - sys.getsizeof(objects)) / len(objects)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    interpreter = Interpreter(Context(SOURCE, "<bench>"))
+    point = point_class(interpreter)
+
+    def shaped(x, y):
+        return point.call(interpreter, [x, y], None)
+
+    def dict_backed(x, y):
+        instance = DictInstance(point)
+        instance.set("x", x)
+        instance.set("y", y)
+        return instance
+
+    old = measure(dict_backed, count)
+    new = measure(shaped, count)
+
+    print(f"{count} Point(x, y) instances")
+    print(f"fields dict : {old:8.1f} bytes/instance")
+    print(f"shape       : {new:8.1f} bytes/instance")
+    print(f"saved       : {1 - new / old:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Lexer throughput on a generated multi-megabyte .nut file.
+
+Writes a program of the requested size made of varied functions, classes,
+strings, comments and arithmetic, then reports how fast Lexer.tokenize()
+turns it into a TokenBuffer.
+
+    python bench/bench_lexer.py [megabytes]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "pynut"))
+
+from utils import Context
+from nutlexer import Lexer
+
+CHUNK = """\
+// block {i}: a function, a class and some loops
+fun compute_{i}(a, b) {{
+    var total = a * {i}.5 + b / 2;
+    if (total >= 100 and a != b) {{ return total - {i}; }}
+    return "value_{i}: " + str(total);
+}}
+
+class Shape_{i} {{
+    init(w, h) {{ this.w = w; this.h = h; }}
+    area() {{ return this.w * this.h; }}
+    static unit() {{ return Shape_{i}(1, 1); }}
+}}
+
+var counter_{i} = 0;
+while (counter_{i} < 10) {{ counter_{i} = counter_{i} + 1; }}
+print compute_{i}(counter_{i}, {i}) ;
+"""
+
+
+def generate(megabytes: float) -> str:
+    parts, size, i = [], 0, 0
+    while size < megabytes * 1024 * 1024:
+        chunk = CHUNK.format(i=i)
+        parts.append(chunk)
+        size += len(chunk)
+        i += 1
+    return "".join(parts)
+
+
+def main() -> None:
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+    with tempfile.NamedTemporaryFile("w", suffix=".nut", delete=False) as f:
+        f.write(generate(megabytes))
+        path = f.name
+
+    try:
+        with open(path) as f:
+            source = f.read()
+        size = len(source.encode()) / (1024 * 1024)
+
+        best, count = float("inf"), 0
+        for _ in range(3):
+            start = time.perf_counter()
+            count = len(Lexer(Context(source, path)).tokenize())
+            best = min(best, time.perf_counter() - start)
+    finally:
+        os.unlink(path)
+
+    print(f"{size:.1f} MB, {count} tokens")
+    print(f"lex: {best:8.3f} s  {size / best:8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
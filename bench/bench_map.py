@@ -0,0 +1,121 @@
+"""Insert and lookup throughput of Map at a million entries.
+
+Runs a Nut program that fills a Map with number keys and then with string
+keys, reads every entry back and checks it with has, timing each loop with
+clock(). Every engine runs the same program, and a plain Python dict doing
+the same work is shown for scale.
+
+    python bench/bench_map.py [entries] [--engine E ...]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "pynut"))
+
+from utils import Context
+from nutlexer import Lexer
+from nutparser import Parser
+from nutresolver import Resolver
+from nut import engines, load_engine
+
+PROGRAM = """
+var n = {n};
+var m = Map();
+var start = clock();
+for (var i = 0; i < n; i = i + 1) {{ m[i] = i; }}
+print clock() - start;
+
+var total = 0;
+start = clock();
+for (var i = 0; i < n; i = i + 1) {{ total = total + m[i]; }}
+print clock() - start;
+
+var names = Array(n);
+for (var i = 0; i < n; i = i + 1) {{ names[i] = "k" + str(i); }}
+var s = Map();
+start = clock();
+for (var i = 0; i < n; i = i + 1) {{ s[names[i]] = i; }}
+print clock() - start;
+
+start = clock();
+for (var i = 0; i < n; i = i + 1) {{ total = total + s[names[i]]; }}
+print clock() - start;
+
+var found = 0;
+start = clock();
+for (var i = 0; i < n; i = i + 1) {{ if (has(s, names[i])) found = found + 1; }}
+print clock() - start;
+print size(m) + size(s) + found;
+"""
+PHASES = ("insert number", "lookup number", "insert string", "lookup string", "has string")
+
+
+def run_nut(engine: str, n: int) -> list[float]:
+    context = Context(PROGRAM.format(n=n), "<bench>")
+    statements = Parser(Lexer(context).tokenize(), context).parse()
+    intp = load_engine(engine)(context)
+    Resolver(intp).resolve(statements)
+
+    output = io.StringIO()
+    with redirect_stdout(output):
+        intp.interpret(statements)
+    *times, count = output.getvalue().split()
+    assert float(count) == 3 * n, "every entry should have been found"
+    return [float(t) for t in times]
+
+
+def run_python(n: int) -> list[float]:
+    times = []
+    m: dict = {}
+    start = time.time()
+    for i in range(n):
+        m[float(i)] = float(i)
+    times.append(time.time() - start)
+
+    total = 0.0
+    start = time.time()
+    for i in range(n):
+        total += m[float(i)]
+    times.append(time.time() - start)
+
+    names = ["k" + str(float(i)) for i in range(n)]
+    s: dict = {}
+    start = time.time()
+    for i in range(n):
+        s[names[i]] = float(i)
+    times.append(time.time() - start)
+
+    start = time.time()
+    for i in range(n):
+        total += s[names[i]]
+    times.append(time.time() - start)
+
+    start = time.time()
+    found = sum(1 for i in range(n) if names[i] in s)
+    times.append(time.time() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Map insert/lookup throughput")
+    parser.add_argument("entries", nargs="?", type=int, default=1_000_000)
+    parser.add_argument("--engine", action="append", choices=engines,
+                        help="engine to run, can be given more than once (default all)")
+    parsed = parser.parse_args()
+    n = parsed.entries
+
+    print(f"{n} entries, million operations per second\n")
+    print(f"{'':8} " + " ".join(f"{phase:>14}" for phase in PHASES))
+    for name in parsed.engine or engines:
+        times = run_nut(name, n)
+        print(f"{name:8} " + " ".join(f"{n / t / 1e6 if t else 0:14.2f}" for t in times))
+    times = run_python(n)
+    print(f"{'dict':8} " + " ".join(f"{n / t / 1e6 if t else 0:14.2f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
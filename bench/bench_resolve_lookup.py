@@ -0,0 +1,117 @@
+"""Per-lookup cost of resolved variable access on deep expressions.
+
+Compares the old resolver side table with reading the depth/slot the
+resolver now stores on the node itself. The old AST nodes, Tokens and Spans
+were dataclasses with unsafe_hash=True, so every lookup in the table hashed
+the node's Token and Span and, for an Assign, its whole value subtree. Here
+each resolved node gets a stand-in built the same way to key the table, and
+both sides fetch the same (depth, slot) pair.
+
+    python bench/bench_resolve_lookup.py [depth]
+"""
+import os
+import sys
+import timeit
+from dataclasses import dataclass
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "pynut"))
+
+import nutast as at
+from utils import Context
+from nutlexer import Lexer
+from nuttoken import Token
+from nutparser import Parser
+from nutastinterpreter import Interpreter
+from nutresolver import Resolver
+
+
+@dataclass(unsafe_hash=True)
+class OldSpan:
+    start: int
+    end: int
+    line: int
+
+
+@dataclass(unsafe_hash=True)
+class OldToken:
+    type: int
+    value: Any
+    span: OldSpan
+
+
+@dataclass(unsafe_hash=True)
+class OldNode:
+    """Hashes like the old dataclass nodes: every field, recursively."""
+    span: OldSpan
+    kind: str
+    fields: tuple
+
+
+def old_key(value: Any, context: Context) -> Any:
+    """The old, dataclass form of a node or Token of the current tree."""
+    if isinstance(value, Token):
+        return OldToken(value.type, value.value, old_span(value.span, context))
+    if isinstance(value, at.Node):
+        fields = tuple(old_key(v, context) for k, v in vars(value).items()
+                       if k not in ("span", "depth", "slot"))
+        return OldNode(old_span(value.span, context), type(value).__name__, fields)
+    if isinstance(value, list):
+        return tuple(old_key(v, context) for v in value)
+    return value
+
+
+def old_span(span: int, context: Context) -> OldSpan:
+    s = context.spans.span(span)
+    return OldSpan(s.start, s.end, s.line)
+
+
+def deep_program(depth: int) -> str:
+    expr = " + ".join("x" for _ in range(depth))
+    return f"{{ var x = 1; var y = 0; y = {expr}; }}"
+
+
+def collect(node, kinds, out):
+    if isinstance(node, kinds):
+        out.append(node)
+    if isinstance(node, list):
+        for n in node:
+            collect(n, kinds, out)
+    elif isinstance(node, at.Node):
+        for value in vars(node).values():
+            if isinstance(value, (list, at.Node)):
+                collect(value, kinds, out)
+    return out
+
+
+def main() -> None:
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    context = Context(deep_program(depth), "<bench>")
+    statements = Parser(Lexer(context).tokenize(), context).parse()
+    Resolver(Interpreter(context)).resolve(statements)
+
+    nodes = collect(statements, (at.Variable, at.Assign), [])
+    keys = [old_key(n, context) for n in nodes]
+    side_table = {k: (n.depth, n.slot) for k, n in zip(keys, nodes)}
+
+    def by_table():
+        for k in keys:
+            side_table.get(k, None)
+
+    def by_node():
+        for n in nodes:
+            (n.depth, n.slot) if n.depth is not None else None
+
+    number = 50
+    table = min(timeit.repeat(by_table, number=number, repeat=5))
+    attr = min(timeit.repeat(by_node, number=number, repeat=5))
+    lookups = number * len(nodes)
+
+    print(f"{len(nodes)} resolved nodes, expression depth {depth}")
+    print(f"side table : {table / lookups * 1e9:10.1f} ns/lookup")
+    print(f"on node    : {attr / lookups * 1e9:10.1f} ns/lookup")
+    print(f"speedup    : {table / attr:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
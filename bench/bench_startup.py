@@ -0,0 +1,90 @@
+"""Startup time of `python nut.py <script>` against a budget.
+
+Launches the interpreter on a one line script many times and reports the
+best wall clock time over a bare `python -c pass`, which is the part nut
+itself is responsible for. One extra run under `python -X importtime` lists
+the modules that cost the most to import.
+
+The script is run once beforehand so the measured launches load its
+program from __nutcache__, like repeated launches of the same script do.
+Exits with status 1 when the overhead is over the budget.
+
+    python bench/bench_startup.py [--runs N] [--budget MS] [--top N] [--no-cache]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+NUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pynut", "nut.py")
+
+# milliseconds over a bare interpreter for a cached one line script
+BUDGET_MS = 25.0
+
+
+def best(command: list[str], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def import_times(command: list[str]) -> list[tuple[int, int, str]]:
+    """(self us, cumulative us, module) for every module the command imports."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *command],
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(own), int(cumulative), name.strip()))
+    return modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, metavar="MS")
+    parser.add_argument("--top", type=int, default=10, metavar="N", help="slowest imports to list")
+    parser.add_argument("--no-cache", action="store_true", help="measure launches that parse the script")
+    parsed = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    script = os.path.join(directory, "startup.nut")
+    with open(script, "w") as f:
+        f.write('print "hello";\n')
+    command = [NUT, "--no-cache", script] if parsed.no_cache else [NUT, script]
+
+    try:
+        subprocess.run([sys.executable, *command], check=True, stdout=subprocess.DEVNULL)
+        bare = best([sys.executable, "-c", "pass"], parsed.runs)
+        total = best([sys.executable, *command], parsed.runs)
+        modules = import_times(command)
+    finally:
+        shutil.rmtree(directory)
+
+    overhead = total - bare
+    print(f"python -c pass : {bare:7.1f} ms")
+    print(f"nut.py         : {total:7.1f} ms")
+    print(f"overhead       : {overhead:7.1f} ms  (budget {parsed.budget:.1f} ms)")
+    print(f"imported {len(modules)} modules, {sum(m[0] for m in modules) / 1000:.1f} ms in total")
+    if sys.flags.dont_write_bytecode:
+        print("note: PYTHONDONTWRITEBYTECODE is set, every module is compiled on every launch")
+
+    print(f"\nslowest imports (self ms, cumulative ms):")
+    for own, cumulative, name in sorted(modules, reverse=True)[:parsed.top]:
+        print(f"  {own / 1000:6.1f} {cumulative / 1000:6.1f}  {name}")
+
+    if overhead > parsed.budget:
+        print(f"\nover budget by {overhead - parsed.budget:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Cold versus warm startup with the __nutcache__ program cache.
+
+Generates a script with many small functions and classes that does little
+work at runtime, so startup is dominated by lexing, parsing and resolving.
+Each run is a fresh `python nut.py` process; cold runs delete the cache
+first, warm runs reuse the one left by the previous run.
+
+    python bench/bench_startup_cache.py [blocks] [runs]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+NUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pynut", "nut.py")
+
+BLOCK = """\
+fun helper_{i}(a, b) {{
+    var x = a * 2 + b;
+    while (x > 100) {{ x = x / 2; }}
+    if (x == {i}) {{ return "hit"; }} else {{ return x - {i}; }}
+}}
+class Point_{i} {{
+    init(x, y) {{ this.x = x; this.y = y; }}
+    sum() {{ return this.x + this.y + helper_{i}(this.x, this.y); }}
+}}
+"""
+
+
+def run(path: str, *args: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, NUT, *args, path], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "startup.nut")
+    with open(path, "w") as f:
+        f.write("".join(BLOCK.format(i=i) for i in range(blocks)))
+        f.write(f"print Point_0(1, 2).sum();\n")
+    cache = os.path.join(directory, "__nutcache__")
+
+    try:
+        uncached = min(run(path, "--no-cache") for _ in range(runs))
+
+        cold = []
+        for _ in range(runs):
+            shutil.rmtree(cache, ignore_errors=True)
+            cold.append(run(path))
+
+        warm = min(run(path) for _ in range(runs))
+    finally:
+        shutil.rmtree(directory)
+
+    lines = BLOCK.count("\n") * blocks + 1
+    print(f"{lines} line script, best of {runs} process runs")
+    print(f"--no-cache : {uncached * 1000:8.1f} ms")
+    print(f"cold       : {min(cold) * 1000:8.1f} ms  (parse, resolve and write the cache)")
+    print(f"warm       : {warm * 1000:8.1f} ms  (load the cache)")
+    print(f"speedup    : {uncached / warm:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Memory and time of holding tokens as Token objects against a TokenBuffer.
+
+Lexes the same generated program as bench_lexer.py into the parallel arrays
+Lexer.tokenize() fills, and into a list of Token objects made from them with
+Lexer.scan_tokens(). Reports how long each takes and how much memory the
+tokens hold on to.
+
+    python bench/bench_tokens.py [megabytes]
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "pynut"))
+
+from utils import Context
+from nutlexer import Lexer
+from bench_lexer import generate
+
+WAYS = {
+    "Token objects": lambda context: Lexer(context).scan_tokens(),
+    "TokenBuffer": lambda context: Lexer(context).tokenize(),
+}
+
+
+def best(function, runs: int = 3) -> float:
+    times = []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def retained(function) -> int:
+    """Bytes still allocated by what function returns."""
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main() -> None:
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    source = generate(megabytes)
+    count = len(Lexer(Context(source)).tokenize())
+    print(f"{len(source.encode()) / (1024 * 1024):.1f} MB, {count} tokens\n")
+
+    print(f"{'':14} {'lex s':>8} {'memory MB':>10} {'bytes/token':>12}")
+    for name, lex in WAYS.items():
+        lex_time = best(lambda: lex(Context(source)))
+        size = retained(lambda: lex(Context(source)))
+        print(f"{name:14} {lex_time:8.3f} {size / (1024 * 1024):10.1f} {size / count:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
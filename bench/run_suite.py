@@ -0,0 +1,199 @@
+"""Runs the .nut programs in bench/suite and times each phase separately.
+
+Every program is lexed, parsed, resolved and executed in-process, --repeat
+times per engine, with a fresh Context and interpreter each time. The best
+and median time of every phase go to a JSON file, together with a hash of
+what the program printed so a change in behaviour shows up next to a change
+in speed. For the closure, vm and python engines execute includes compiling
+the resolved tree.
+
+Given --baseline, a previous results file, each benchmark's total and
+execute times are compared against it. A phase is a regression when its best
+time is more than --threshold percent slower and also slower by more than
+--min-delta milliseconds, which keeps sub-millisecond phases from flapping.
+The exit status is 1 when there is a regression or an output mismatch, so
+the runner can gate a change:
+
+    python bench/run_suite.py --output base.json            # before
+    python bench/run_suite.py --baseline base.json          # after
+
+    python bench/run_suite.py [names...] [--engine E ...] [--repeat N] [-O]
+                              [--output FILE] [--baseline FILE]
+                              [--threshold PCT] [--min-delta MS]
+"""
+import argparse
+import gc
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "pynut"))
+
+from utils import Context
+from nutlexer import Lexer
+from nutparser import Parser
+from nutresolver import Resolver
+from nutoptimizer import Optimizer
+from nut import engines, load_engine
+
+SUITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite")
+PHASES = ("lex", "parse", "resolve", "execute")
+# phases compared against a baseline, lexing to resolving are covered by the total
+COMPARED = ("total", "execute")
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def run_once(name: str, source: str, engine: type, optimize: bool) -> tuple[dict[str, float], str]:
+    """Times one run of a program, returns seconds per phase and what it printed."""
+    context = Context(source, name)
+    times = {}
+    gc.collect()
+
+    start = time.perf_counter()
+    tokens = Lexer(context).tokenize()
+    times["lex"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    statements = Parser(tokens, context).parse()
+    if optimize:
+        statements = Optimizer().optimize(statements)
+    times["parse"] = time.perf_counter() - start
+    if context.has_error:
+        raise BenchmarkError(f"{name} failed to parse")
+
+    intp = engine(context)
+    start = time.perf_counter()
+    Resolver(intp).resolve(statements)
+    times["resolve"] = time.perf_counter() - start
+    if context.has_error:
+        raise BenchmarkError(f"{name} failed to resolve")
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(output):
+            intp.interpret(statements)
+    except SystemExit:
+        # runtime errors are reported and then quit()
+        raise BenchmarkError(f"{name} failed at runtime: {output.getvalue().strip()}") from None
+    times["execute"] = time.perf_counter() - start
+
+    times["total"] = sum(times[phase] for phase in PHASES)
+    return times, output.getvalue()
+
+
+def run_benchmark(name: str, source: str, engine: str, repeat: int, optimize: bool) -> dict:
+    runs: dict[str, list[float]] = {phase: [] for phase in (*PHASES, "total")}
+    outputs = set()
+    for _ in range(repeat):
+        times, output = run_once(name, source, load_engine(engine), optimize)
+        outputs.add(output)
+        for phase, seconds in times.items():
+            runs[phase].append(seconds)
+
+    if len(outputs) > 1:
+        raise BenchmarkError(f"{name} printed different output between runs on {engine}")
+
+    result = {phase: {"best": min(times), "median": statistics.median(times)} for phase, times in runs.items()}
+    result["output"] = hashlib.sha256(outputs.pop().encode()).hexdigest()[:16]
+    return result
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta: float) -> bool:
+    """Prints the change of every benchmark against the baseline, returns False on a regression."""
+    ok = True
+    print(f"\ncompared to baseline (regression: > {threshold:g}% and > {min_delta:g} ms slower)")
+    for engine, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            base = baseline.get(engine, {}).get(name)
+            if base is None:
+                print(f"  {engine:8} {name:12} new")
+                continue
+
+            notes = []
+            if result["output"] != base["output"]:
+                notes.append("OUTPUT CHANGED")
+                ok = False
+            for phase in COMPARED:
+                now, before = result[phase]["best"], base[phase]["best"]
+                change = (now - before) / before * 100 if before else 0.0
+                regressed = change > threshold and (now - before) * 1000 > min_delta
+                ok = ok and not regressed
+                notes.append(f"{phase} {before * 1000:8.2f} -> {now * 1000:8.2f} ms {change:+6.1f}%{' REGRESSION' if regressed else ''}")
+            print(f"  {engine:8} {name:12} {'  '.join(notes)}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="time the bench/suite programs phase by phase")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all of bench/suite by default")
+    parser.add_argument("--engine", action="append", choices=engines,
+                        help="engine to run, can be given more than once (default tree)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark, the best is compared")
+    parser.add_argument("-O", "--optimize", action="store_true", help="run the AST optimizer after parsing")
+    parser.add_argument("--output", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, metavar="PCT",
+                        help="percent slowdown counted as a regression (default 10)")
+    parser.add_argument("--min-delta", type=float, default=1.0, metavar="MS",
+                        help="ignore slowdowns smaller than this many milliseconds (default 1)")
+    parsed = parser.parse_args()
+
+    available = sorted(f[:-len(".nut")] for f in os.listdir(SUITE) if f.endswith(".nut"))
+    names = parsed.names or available
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        parser.error(f"unknown benchmarks {', '.join(unknown)}, available: {', '.join(available)}")
+
+    # the tree engine recurses through several Python frames per Nut call
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+    results: dict[str, dict[str, dict]] = {}
+    print(f"{'engine':8} {'benchmark':12} " + " ".join(f"{phase:>9}" for phase in (*PHASES, "total")) + "   (best ms)")
+    for engine in parsed.engine or ["tree"]:
+        results[engine] = {}
+        for name in names:
+            with open(os.path.join(SUITE, f"{name}.nut")) as f:
+                source = f.read()
+            try:
+                result = run_benchmark(name, source, engine, parsed.repeat, parsed.optimize)
+            except BenchmarkError as e:
+                print(f"error: {e}")
+                sys.exit(1)
+            results[engine][name] = result
+            print(f"{engine:8} {name:12} " + " ".join(f"{result[phase]['best'] * 1000:9.2f}" for phase in (*PHASES, "total")))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "repeat": parsed.repeat,
+            "optimize": parsed.optimize,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if parsed.output:
+        with open(parsed.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {parsed.output}")
+
+    if parsed.baseline:
+        with open(parsed.baseline) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline["results"], parsed.threshold, parsed.min_delta):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
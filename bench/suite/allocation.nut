@@ -0,0 +1,14 @@
+// allocation: many short lived instances with fields set in init
+class Vec {
+    init(x, y) {
+        this.x = x;
+        this.y = y;
+    }
+}
+
+var sum = 0;
+for (var i = 0; i < 15000; i = i + 1) {
+    var v = Vec(i, i + 1);
+    sum = sum + v.x + v.y;
+}
+print sum;
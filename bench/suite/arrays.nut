@@ -0,0 +1,24 @@
+// arrays: filling, indexing and slicing numeric arrays, then the bulk builtins
+var n = 20000;
+var a = Array(n);
+for (var i = 0; i < n; i = i + 1) {
+    a[i] = (i * 7919) - (i / 3);
+}
+
+var total = 0;
+for (var i = 0; i < n; i = i + 1) {
+    total = total + a[i];
+}
+print total;
+
+var evens = [];
+for (var i = 0; i < n; i = i + 2) {
+    push(evens, a[i]);
+}
+print len(evens);
+
+sort(a);
+print a[0];
+print a[-1];
+print sum(a[100:200]);
+print min(a) + max(a);
@@ -0,0 +1,53 @@
+// classes: a binary search tree of node objects, insertion and recursive walks
+class Node {
+    init(key) {
+        this.key = key;
+        this.left = nil;
+        this.right = nil;
+    }
+
+    insert(key) {
+        if (key < this.key) {
+            if (this.left == nil) this.left = Node(key); else this.left.insert(key);
+        } else {
+            if (this.right == nil) this.right = Node(key); else this.right.insert(key);
+        }
+    }
+
+    size() {
+        var n = 1;
+        if (this.left != nil) n = n + this.left.size();
+        if (this.right != nil) n = n + this.right.size();
+        return n;
+    }
+
+    sum() {
+        var n = this.key;
+        if (this.left != nil) n = n + this.left.sum();
+        if (this.right != nil) n = n + this.right.sum();
+        return n;
+    }
+}
+
+class Tree {
+    init() { this.root = nil; }
+
+    add(key) {
+        if (this.root == nil) this.root = Node(key); else this.root.insert(key);
+    }
+
+    static build(count) {
+        var tree = Tree();
+        var seed = 7;
+        for (var i = 0; i < count; i = i + 1) {
+            seed = seed * 31 + 17;
+            while (seed >= 1000003) seed = seed - 1000003;
+            tree.add(seed);
+        }
+        return tree;
+    }
+}
+
+var tree = Tree.build(1000);
+print tree.root.size();
+print tree.root.sum();
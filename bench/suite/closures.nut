@@ -0,0 +1,24 @@
+// closures: creating closures and calling them through captured variables
+fun make_counter() {
+    var count = 0;
+    fun inc() {
+        count = count + 1;
+        return count;
+    }
+    return inc;
+}
+
+fun make_adder(n) {
+    fun add(x) { return x + n; }
+    return add;
+}
+
+var total = 0;
+for (var i = 0; i < 3000; i = i + 1) {
+    var counter = make_counter();
+    var add = make_adder(i);
+    counter();
+    counter();
+    total = total + add(counter());
+}
+print total;
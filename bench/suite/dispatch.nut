@@ -0,0 +1,24 @@
+// dispatch: polymorphic method calls over a few classes with the same interface
+class Square {
+    init(side) { this.side = side; }
+    area() { return this.side * this.side; }
+}
+
+class Rect {
+    init(w, h) { this.w = w; this.h = h; }
+    area() { return this.w * this.h; }
+}
+
+class Circle {
+    init(r) { this.r = r; }
+    area() { return 3 * this.r * this.r; }
+}
+
+var a = Square(2);
+var b = Rect(2, 3);
+var c = Circle(1);
+var total = 0;
+for (var i = 0; i < 10000; i = i + 1) {
+    total = total + a.area() + b.area() + c.area();
+}
+print total;
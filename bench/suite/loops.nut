@@ -0,0 +1,14 @@
+// loops: nested while and for loops over local arithmetic
+var total = 0;
+for (var i = 0; i < 150; i = i + 1) {
+    var j = 0;
+    while (j < 150) {
+        if (j / 2 > i) {
+            total = total + 1;
+        } else {
+            total = total - 1;
+        }
+        j = j + 1;
+    }
+}
+print total;
@@ -0,0 +1,28 @@
+// maps: filling maps with number and string keys, reading, testing and deleting them
+var squares = Map();
+var names = Map();
+for (var i = 0; i < 20000; i = i + 1) {
+    squares[i] = i * i;
+    names["w" + str(i)] = i;
+}
+print size(squares);
+print size(names);
+
+var total = 0;
+var ks = keys(names);
+for (var i = 0; i < len(ks); i = i + 1) {
+    total = total + names[ks[i]];
+}
+print total;
+
+var found = 0;
+for (var i = 0; i < 40000; i = i + 7) {
+    if (has(squares, i)) found = found + 1;
+}
+print found;
+
+for (var i = 0; i < 20000; i = i + 2) {
+    delete(names, "w" + str(i));
+}
+print size(names);
+print sum(values(squares));
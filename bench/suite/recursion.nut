@@ -0,0 +1,14 @@
+// recursion: naive fibonacci and ackermann, call overhead and deep stacks
+fun fib(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+}
+
+fun ack(m, n) {
+    if (m == 0) return n + 1;
+    if (n == 0) return ack(m - 1, 1);
+    return ack(m - 1, ack(m, n - 1));
+}
+
+print fib(20);
+print ack(2, 40);
@@ -0,0 +1,15 @@
+// strings: concatenation in a loop and string equality
+var s = "";
+var matches = 0;
+for (var i = 0; i < 5000; i = i + 1) {
+    s = s + "ab";
+    var word = "w" + str(i);
+    if (word == "w" + str(4999)) matches = matches + 1;
+}
+
+var line = "";
+for (var i = 0; i < 5000; i = i + 1) {
+    line = "ab" + line;
+}
+print matches;
+print s == line;
@@ -1,17 +1,64 @@
-import argparse
 import os
-from typing import Optional
-from utils import Context
-from nutlexer import Lexer
-from nutparser import Parser
-from nutastinterpreter import Interpreter
-from nutresolver import Resolver
+import sys
+from typing import Callable, Optional
+from utils import Context, SpanTable
+from nutastcache import ProgramCache
+import nutast as at
+
+
+# module and class of each engine, only the one that runs gets imported
+engines = {
+    "tree": ("nutastinterpreter", "Interpreter"),
+    "closure": ("nutclosureinterpreter", "ClosureInterpreter"),
+    "vm": ("nutvm", "VMInterpreter"),
+    "python": ("nuttranspiler", "PythonInterpreter"),
+}
+
+
+def load_engine(name: str) -> type:
+    module, cls = engines[name]
+    return getattr(__import__(module), cls)
 
 
 class Nut:
-    def __init__(self) -> None:
+    def __init__(self, engine: str = "tree") -> None:
         self.has_error = False
         self.source: Optional[list[str]] = None
+        self.engine = load_engine(engine)
+        # AST to AST passes run between the parser and the resolver, by name
+        # (on a program the resolver has already accepted, see resolve)
+        self.passes: dict[str, Callable[[list[at.Stmnt], Context], list[at.Stmnt]]] = {}
+        # reuse resolved programs from __nutcache__
+        self.use_cache = True
+        # cache size for memoizing pure functions, None to not memoize
+        self.memo_size: Optional[int] = None
+        self.verbose = False
+        # print a profile of the run and/or write it to a pstats file
+        self.profile = False
+        self.profile_out: Optional[str] = None
+        # write sampled stacks in collapsed flamegraph format, every sample_interval seconds
+        self.sample_out: Optional[str] = None
+        self.sample_interval = 0.01
+        # count node visits, allocations and completions and print them afterwards
+        self.stats = False
+
+    def transform(self, statements: list[at.Stmnt], context: Context) -> list[at.Stmnt]:
+        for ast_pass in self.passes.values():
+            statements = ast_pass(statements, context)
+        return statements
+
+    def resolve(self, statements: list[at.Stmnt], context: Context, intp) -> list[at.Stmnt]:
+        """Runs the passes over statements and resolves what they return."""
+        from nutresolver import Resolver
+
+        if self.passes:
+            # the program as written is checked first, so a pass that removes
+            # code (the optimizer's dead branches) cannot hide an error in it
+            Resolver(intp).resolve(statements)
+            if context.has_error: return statements
+            statements = self.transform(statements, context)
+        Resolver(intp).resolve(statements)
+        return statements
 
     def run_file(self, filename: str) -> None:
         if not os.path.isfile(filename):
@@ -21,20 +68,80 @@ class Nut:
         with open(filename) as f:
             lines = f.read()
             context = Context(lines, filename)
-            
-        tokens = Lexer(context).scan_tokens()
-        statements = Parser(tokens, context).parse()
-        if context.has_error: return
 
-        intp = Interpreter(context)
-        Resolver(intp).resolve(statements)
-        if context.has_error: return
+        cache = ProgramCache(filename, lines, ",".join(self.passes)) if self.use_cache else None
+        cached = cache.load() if cache is not None else None
+        if cached is not None:
+            # the span ids in the tree refer to the table stored with it
+            statements, context.spans = cached
+
+        intp = self.engine(context)
+        if cached is None:
+            # a cached program needs no lexer, parser or resolver
+            from nutlexer import Lexer
+            from nutparser import Parser
+
+            statements = Parser(Lexer(context).tokenize(), context).parse()
+            if context.has_error: return
+
+            statements = self.resolve(statements, context, intp)
+            if context.has_error: return
+
+            if cache is not None:
+                cache.store(statements, context.spans)
+
+        if self.memo_size is not None:
+            from nutmemo import PurityAnalyzer
+            pure = PurityAnalyzer(intp).analyze(statements)
+            intp.memo_size = self.memo_size
+            if self.verbose:
+                print(f"memo: pure functions: {', '.join(f.name.value for f in pure) or 'none'}")
         
-        intp.interpret(statements)
+        sampler = None
+        if self.sample_out is not None:
+            from nutsampler import Sampler
+            sampler = Sampler(context.spans, self.sample_interval)
+            sampler.start()
+
+        stats = None
+        if self.stats:
+            from nutstats import ExecutionStats
+            stats = ExecutionStats(intp)
+            stats.start()
+
+        try:
+            intp.interpret(statements)
+        finally:
+            # also when a runtime error ends the program
+            if stats is not None:
+                stats.stop()
+                stats.report()
+            if sampler is not None:
+                sampler.stop()
+                sampler.write(self.sample_out)
+                print(f"sampler: {sampler.samples} samples written to {self.sample_out}")
+            if (profiler := getattr(intp, "profiler", None)) is not None:
+                self.report_profile(profiler)
+
+        if self.verbose:
+            for memo in getattr(intp, "memos", ()):
+                print(f"memo: {memo}")
+
+    def report_profile(self, profiler) -> None:
+        if self.profile:
+            profiler.report()
+        if self.profile_out is not None:
+            profiler.dump(self.profile_out)
+            print(f"profile: written to {self.profile_out}, read it with pstats")
         
 
     def run_prompt(self) -> None:
-        intp = Interpreter(None)
+        from nutlexer import Lexer
+        from nutparser import Parser
+
+        # functions defined on one line are called from later ones, so every line adds to the same spans
+        spans = SpanTable()
+        intp = self.engine(Context("", spans=spans))
         
         while True:
             try:
@@ -42,14 +149,13 @@ class Nut:
                 line = input()
                 if line == "exit":
                     break
-                context = Context(line)
+                context = Context(line, spans=spans)
                 intp.context = context
 
-                tokens = Lexer(context).scan_tokens()
-                statements = Parser(tokens, context).parse()
+                statements = Parser(Lexer(context).tokenize(), context).parse()
                 if context.has_error: continue
 
-                Resolver(intp).resolve(statements)
+                statements = self.resolve(statements, context, intp)
                 if context.has_error: continue
                 
                 intp.interpret(statements)
@@ -59,9 +165,65 @@ class Nut:
 
 
     def main(self) -> None:
+        # a lone script is by far the most common launch, it doesn't need argparse
+        if len(sys.argv) == 2 and not sys.argv[1].startswith("-"):
+            self.run_file(sys.argv[1])
+            return
+
+        import argparse
         parser = argparse.ArgumentParser()
         parser.add_argument("file", nargs="?", default=None)
+        parser.add_argument("--engine", choices=engines, default="tree",
+                            help="execution engine: 'tree' walks the AST, 'closure' compiles it to Python closures first, 'vm' compiles it to bytecode, 'python' transpiles it to Python source")
+        parser.add_argument("-O", "--optimize", action="store_true",
+                            help="fold constants and remove dead branches before running")
+        parser.add_argument("--memoize", action="store_true",
+                            help="cache the results of functions found to be pure (tree engine)")
+        parser.add_argument("--memo-size", type=int, default=4096, metavar="N",
+                            help="results kept per memoized function, least recently used go first")
+        parser.add_argument("--no-cache", action="store_true",
+                            help="always parse and resolve the file instead of using __nutcache__")
+        parser.add_argument("--profile", action="store_true",
+                            help="print the calls and time spent in every function (tree engine)")
+        parser.add_argument("--profile-out", metavar="FILE",
+                            help="write the profile to FILE in the format read by pstats")
+        parser.add_argument("--sample", metavar="FILE",
+                            help="sample the Nut call stack and write it to FILE as collapsed stacks for flamegraphs (tree engine)")
+        parser.add_argument("--sample-interval", type=float, default=10.0, metavar="MS",
+                            help="milliseconds between samples (default 10)")
+        parser.add_argument("--stats", action="store_true",
+                            help="count node visits, objects created and returns/breaks during the run (tree engine)")
+        parser.add_argument("-v", "--verbose", action="store_true",
+                            help="report what the optimizer changed and memoization hits")
         parsed = parser.parse_args()
+        self.engine = load_engine(parsed.engine)
+        self.memo_size = parsed.memo_size if parsed.memoize else None
+        if parsed.memoize and parsed.engine != "tree":
+            parser.error("--memoize needs the tree engine")
+        self.verbose = parsed.verbose
+        self.use_cache = not parsed.no_cache
+        self.profile = parsed.profile
+        self.profile_out = parsed.profile_out
+
+        self.sample_out = parsed.sample
+        self.sample_interval = parsed.sample_interval / 1000
+
+        if parsed.sample and parsed.engine != "tree":
+            parser.error("--sample needs the tree engine")
+
+        self.stats = parsed.stats
+        if parsed.stats and parsed.engine != "tree":
+            parser.error("--stats needs the tree engine")
+
+        if parsed.profile or parsed.profile_out:
+            if parsed.engine != "tree":
+                parser.error("--profile needs the tree engine")
+            from nutprofile import ProfilingInterpreter
+            self.engine = ProfilingInterpreter
+
+        if parsed.optimize:
+            from nutoptimizer import Optimizer
+            self.passes["optimize"] = lambda statements, context: Optimizer(parsed.verbose, context).optimize(statements)
 
         if parsed.file is None:
             self.run_prompt()
@@ -0,0 +1,130 @@
+from array import array
+from typing import Any, Optional, Union
+from nuterror import InterpreterError
+from utils import SpanId
+
+
+class NutArray:
+    """A growable array of values.
+
+    While every item is a number they are kept unboxed in an array('d'),
+    8 bytes each, which the bulk builtins (sum, min, max, sort) walk at C
+    speed. Storing anything else moves the items to a plain list for good.
+    """
+    __slots__ = ("items",)
+
+    def __init__(self, items: Union[array, list]) -> None:
+        self.items = items
+
+    @classmethod
+    def of(cls, values: list) -> 'NutArray':
+        if all(type(v) is float for v in values):
+            return cls(array("d", values))
+        return cls(values)
+
+    def index(self, index: Any, span: Optional[SpanId]) -> int:
+        if type(index) is not float or not index.is_integer():
+            raise InterpreterError("Array index must be an integer", span=span)
+        i = int(index)
+        if not -len(self.items) <= i < len(self.items):
+            raise InterpreterError("Array index out of range", span=span)
+        return i
+
+    def bound(self, value: Any, span: Optional[SpanId]) -> Optional[int]:
+        if value is None:
+            return None
+        if type(value) is not float or not value.is_integer():
+            raise InterpreterError("Slice bounds must be integers", span=span)
+        return int(value)
+
+    def get(self, index: Any, span: Optional[SpanId] = None) -> Any:
+        return self.items[self.index(index, span)]
+
+    def set(self, index: Any, value: Any, span: Optional[SpanId] = None) -> None:
+        i = self.index(index, span)
+        if type(value) is not float and type(self.items) is array:
+            self.items = self.items.tolist()
+        self.items[i] = value
+
+    def slice(self, start: Any, end: Any, span: Optional[SpanId] = None) -> 'NutArray':
+        return NutArray(self.items[self.bound(start, span):self.bound(end, span)])
+
+    def push(self, value: Any) -> None:
+        if type(value) is not float and type(self.items) is array:
+            self.items = self.items.tolist()
+        self.items.append(value)
+
+    def pop(self) -> Any:
+        if not self.items:
+            raise IndexError("pop from an empty array")
+        return self.items.pop()
+
+    def __str__(self) -> str:
+        return "[" + ", ".join(map(str, self.items)) + "]"
+
+
+def _array(n: Any) -> NutArray:
+    if type(n) is not float or not n.is_integer() or n < 0:
+        raise ValueError("Array size must be a non-negative integer")
+    return NutArray(array("d", bytes(8 * int(n))))
+
+
+def _sequence(value: Any, function: str) -> Union[array, list]:
+    if not isinstance(value, NutArray):
+        raise TypeError(f"{function} expects an array")
+    return value.items
+
+
+def _len(value: Any) -> float:
+    if isinstance(value, str):
+        return float(len(value))
+    return float(len(_sequence(value, "len")))
+
+
+def _sum(value: Any) -> float:
+    return float(sum(_sequence(value, "sum")))
+
+
+def _min(value: Any) -> Any:
+    if not (items := _sequence(value, "min")):
+        raise ValueError("min of an empty array")
+    return min(items)
+
+
+def _max(value: Any) -> Any:
+    if not (items := _sequence(value, "max")):
+        raise ValueError("max of an empty array")
+    return max(items)
+
+
+def _push(value: Any, item: Any) -> None:
+    if not isinstance(value, NutArray):
+        raise TypeError("push expects an array")
+    value.push(item)
+
+
+def _pop(value: Any) -> Any:
+    if not isinstance(value, NutArray):
+        raise TypeError("pop expects an array")
+    return value.pop()
+
+
+def _sort(value: Any) -> None:
+    items = _sequence(value, "sort")
+    if type(items) is array:
+        value.items = array("d", sorted(items))
+    else:
+        items.sort()
+
+
+# name -> (arity, function, pure), defined as globals by every engine
+NATIVES = {
+    "Array": (1, _array, False),
+    "len": (1, _len, True),
+    "sum": (1, _sum, True),
+    "min": (1, _min, True),
+    "max": (1, _max, True),
+    "push": (2, _push, False),
+    "pop": (1, _pop, False),
+    "sort": (1, _sort, False),
+}
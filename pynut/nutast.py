@@ -1,28 +1,29 @@
-from dataclasses import dataclass
-from nutlexer import Token
-from utils import Span
-from nutvisitor import ExprVisitor, StmntVisitor
 from abc import ABC, abstractmethod
+from nuttoken import Token
+from utils import SpanId
+from nutvisitor import ExprVisitor, StmntVisitor
+from nutcache import InlineCache
 from typing import Any, Optional, Union
 
 
-@dataclass(unsafe_hash=True)
+# plain classes rather than dataclasses: nodes are only ever compared by
+# identity, and generating ~25 dataclasses was most of the import time
 class Node:
-    span: Span
-    
+    def __init__(self, span: SpanId) -> None:
+        self.span = span
+
 
-@dataclass # type: ignore
 class Expr(ABC, Node):
-    
     @abstractmethod
     def accept(self, visitor: ExprVisitor) -> Any:
         ...
 
-@dataclass(unsafe_hash=True)
 class Binary(Expr):
-    left: Expr
-    operator: Token
-    right: Expr
+    def __init__(self, span: SpanId, left: Expr, operator: Token, right: Expr) -> None:
+        self.span = span
+        self.left = left
+        self.operator = operator
+        self.right = right
 
     def __str__(self) -> str:
         return f"({self.left} {self.operator.value} {self.right})"
@@ -32,9 +33,10 @@ class Binary(Expr):
 
     
     
-@dataclass
 class Grouping(Expr):
-    expression: Expr
+    def __init__(self, span: SpanId, expression: Expr) -> None:
+        self.span = span
+        self.expression = expression
 
     def __str__(self) -> str:
         return f"({self.expression})"
@@ -42,9 +44,10 @@ class Grouping(Expr):
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_grouping_expr(self)
 
-@dataclass(unsafe_hash=True)
 class Literal(Expr):
-    value: Union[float, str, Any]
+    def __init__(self, span: SpanId, value: Union[float, str, Any]) -> None:
+        self.span = span
+        self.value = value
 
     def __str__(self) -> str:
         return str(self.value)
@@ -52,10 +55,14 @@ class Literal(Expr):
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_literal_expr(self)
 
-@dataclass(unsafe_hash=True)
 class Assign(Expr):
-    name: Token
-    value: Expr
+    def __init__(self, span: SpanId, name: Token, value: Expr) -> None:
+        self.span = span
+        self.name = name
+        self.value = value
+        # (depth, slot) filled in by the resolver, None for globals
+        self.depth: Optional[int] = None
+        self.slot = 0
 
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_assign_expr(self)
@@ -63,10 +70,12 @@ class Assign(Expr):
     def __str__(self) -> str:
         return f"{self.name.value} = {self.value}"
 
-@dataclass
 class Get(Expr):
-    object: Expr
-    name: Token
+    def __init__(self, span: SpanId, object: Expr, name: Token) -> None:
+        self.span = span
+        self.object = object
+        self.name = name
+        self.cache = InlineCache()
 
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_get_expr(self)
@@ -74,11 +83,13 @@ class Get(Expr):
     def __str__(self) -> str:
         return f"{self.object}.{self.name.value}"
 
-@dataclass
 class Set(Expr):
-    object: Expr
-    name: Token
-    value: Expr
+    def __init__(self, span: SpanId, object: Expr, name: Token, value: Expr) -> None:
+        self.span = span
+        self.object = object
+        self.name = name
+        self.value = value
+        self.cache = InlineCache()
 
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_set_expr(self)
@@ -86,9 +97,13 @@ class Set(Expr):
     def __str__(self) -> str:
         return f"{self.object}.{self.name.value} = {self.value}"
 
-@dataclass(unsafe_hash=True)
 class This(Expr):
-    this: Token
+    def __init__(self, span: SpanId, this: Token) -> None:
+        self.span = span
+        self.this = this
+        self.depth: Optional[int] = None
+        self.slot = 0
+
     
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_this_expr(self)
@@ -96,10 +111,11 @@ class This(Expr):
     def __str__(self) -> str:
         return "this"
 
-@dataclass
 class Unary(Expr):
-    operator: Token
-    right: Expr
+    def __init__(self, span: SpanId, operator: Token, right: Expr) -> None:
+        self.span = span
+        self.operator = operator
+        self.right = right
 
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_unary_expr(self)
@@ -108,9 +124,12 @@ class Unary(Expr):
         return f"{self.operator.value}{self.right}"
 
 
-@dataclass(unsafe_hash=True)
 class Variable(Expr):
-    name: Token
+    def __init__(self, span: SpanId, name: Token) -> None:
+        self.span = span
+        self.name = name
+        self.depth: Optional[int] = None
+        self.slot = 0
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_variable_expr(self)
@@ -121,22 +140,24 @@ class Variable(Expr):
 
 
 
-@dataclass
 class Logical(Expr):
-    left: Expr
-    operator: Token
-    right: Expr
+    def __init__(self, span: SpanId, left: Expr, operator: Token, right: Expr) -> None:
+        self.span = span
+        self.left = left
+        self.operator = operator
+        self.right = right
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_logical_expr(self)
 
     def __str__(self) -> str:
-        return f"({self.left} {self.operator} {self.right})"
+        return f"({self.left} {self.operator.value} {self.right})"
 
-@dataclass
 class Call(Expr):
-    callee: Expr
-    arguments: list[Expr]
+    def __init__(self, span: SpanId, callee: Expr, arguments: list[Expr]) -> None:
+        self.span = span
+        self.callee = callee
+        self.arguments = arguments
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_call_expr(self)
@@ -144,18 +165,66 @@ class Call(Expr):
     def __str__(self) -> str:
         return f"{self.callee}({', '.join(str(x) for x in self.arguments)})"
 
-@dataclass # type: ignore
+class ArrayLiteral(Expr):
+    def __init__(self, span: SpanId, elements: list[Expr]) -> None:
+        self.span = span
+        self.elements = elements
+
+    def accept(self, visitor: ExprVisitor) -> Any:
+        return visitor.visit_array_expr(self)
+
+    def __str__(self) -> str:
+        return f"[{', '.join(str(x) for x in self.elements)}]"
+
+class Index(Expr):
+    def __init__(self, span: SpanId, object: Expr, index: Expr) -> None:
+        self.span = span
+        self.object = object
+        self.index = index
+
+    def accept(self, visitor: ExprVisitor) -> Any:
+        return visitor.visit_index_expr(self)
+
+    def __str__(self) -> str:
+        return f"{self.object}[{self.index}]"
+
+class Slice(Expr):
+    def __init__(self, span: SpanId, object: Expr, start: Optional[Expr], end: Optional[Expr]) -> None:
+        self.span = span
+        self.object = object
+        self.start = start
+        self.end = end
+
+    def accept(self, visitor: ExprVisitor) -> Any:
+        return visitor.visit_slice_expr(self)
+
+    def __str__(self) -> str:
+        return f"{self.object}[{self.start or ''}:{self.end or ''}]"
+
+class SetIndex(Expr):
+    def __init__(self, span: SpanId, object: Expr, index: Expr, value: Expr) -> None:
+        self.span = span
+        self.object = object
+        self.index = index
+        self.value = value
+
+    def accept(self, visitor: ExprVisitor) -> Any:
+        return visitor.visit_set_index_expr(self)
+
+    def __str__(self) -> str:
+        return f"{self.object}[{self.index}] = {self.value}"
+
 class Stmnt(ABC, Node):
-    
     @abstractmethod
     def accept(self, visitor: StmntVisitor) -> Any:
         ...
 
 
-@dataclass
 class Var(Stmnt):
-    name: Token
-    initializer: Optional[Expr] = None
+    def __init__(self, span: SpanId, name: Token, initializer: Optional[Expr] = None) -> None:
+        self.span = span
+        self.name = name
+        self.initializer = initializer
 
     def accept(self, visitor: 'StmntVisitor') -> Any:
         return visitor.visit_var_stmnt(self)
@@ -163,11 +232,14 @@ class Var(Stmnt):
     def __str__(self) -> str:
         return f"var {self.name.value} = {self.initializer}"
 
-@dataclass
 class Function(Stmnt):
-    name: Token
-    params: list[Token]
-    body: list[Stmnt]
+    def __init__(self, span: SpanId, name: Token, params: list[Token], body: list[Stmnt]) -> None:
+        self.span = span
+        self.name = name
+        self.params = params
+        self.body = body
+        # set by PurityAnalyzer when calls can be memoized
+        self.pure = False
 
     def accept(self, visitor: 'StmntVisitor') -> Any:
         return visitor.visit_function(self)
@@ -176,9 +248,10 @@ class Function(Stmnt):
         nl = "\n"
         return f"fn ({', '.join(p.value for p in self.params)})\n  {f'{nl}'.join(str(x) for x in self.body)}"
 
-@dataclass
 class Expression(Stmnt):
-    expression: Expr
+    def __init__(self, span: SpanId, expression: Expr) -> None:
+        self.span = span
+        self.expression = expression
 
     def accept(self, visitor: 'StmntVisitor') -> Any:
         return visitor.visit_expression_stmnt(self)
@@ -187,10 +260,13 @@ class Expression(Stmnt):
         return str(self.expression)
 
 
-@dataclass
 class Return(Stmnt):
-    keyword: Token
-    value: Expr
+    def __init__(self, span: SpanId, keyword: Token, value: Expr) -> None:
+        self.span = span
+        self.keyword = keyword
+        self.value = value
+        # set by the resolver when value is a call, which then needs no frame of its own
+        self.tail = False
 
     def accept(self, visitor: 'StmntVisitor') -> Any:
         return visitor.visit_return_stmnt(self)
@@ -198,9 +274,10 @@ class Return(Stmnt):
     def __str__(self) -> str:
         return f"return {self.value}"
 
-@dataclass
 class Print(Stmnt):
-    expression: Expr
+    def __init__(self, span: SpanId, expression: Expr) -> None:
+        self.span = span
+        self.expression = expression
 
     def accept(self, visitor: 'StmntVisitor') -> Any:
         return visitor.visit_print_stmnt(self)
@@ -208,9 +285,10 @@ class Print(Stmnt):
     def __str__(self) -> str:
         return f"print {self.expression}"
 
-@dataclass
 class Block(Stmnt):
-    statements: list[Stmnt]
+    def __init__(self, span: SpanId, statements: list[Stmnt]) -> None:
+        self.span = span
+        self.statements = statements
 
     def accept(self, visitor: StmntVisitor) -> Any:
         return visitor.visit_block_stmnt(self)
@@ -224,11 +302,12 @@ class Block(Stmnt):
         return st
 
 
-@dataclass
 class If(Stmnt):
-    condition: Expr
-    then_branch: Stmnt
-    else_branch: Optional[Stmnt] = None
+    def __init__(self, span: SpanId, condition: Expr, then_branch: Stmnt, else_branch: Optional[Stmnt] = None) -> None:
+        self.span = span
+        self.condition = condition
+        self.then_branch = then_branch
+        self.else_branch = else_branch
 
     def accept(self, visitor: StmntVisitor) -> Any:
         return visitor.visit_if_stmnt(self)
@@ -236,7 +315,6 @@ class If(Stmnt):
     def __str__(self) -> str:
         return f"if {self.condition} : {self.then_branch} ? {self.else_branch}"
 
-@dataclass
 class Break(Stmnt):
     def accept(self, visitor: StmntVisitor) -> Any:
         return visitor.visit_break_stmnt(self)
@@ -244,10 +322,11 @@ class Break(Stmnt):
     def __str__(self) -> str:
         return "break"
 
-@dataclass
 class While(Stmnt):
-    condition: Expr
-    body: Stmnt
+    def __init__(self, span: SpanId, condition: Expr, body: Stmnt) -> None:
+        self.span = span
+        self.condition = condition
+        self.body = body
 
     def accept(self, visitor: StmntVisitor) -> Any:
         return visitor.visit_while_stmnt(self)
@@ -255,11 +334,12 @@ class While(Stmnt):
     def __str__(self) -> str:
         return f"while {self.condition}\n{self.body}"
 
-@dataclass
 class Class(Stmnt):
-    name: Token
-    methods: list[Function]
-    static_methods: list[Function]
+    def __init__(self, span: SpanId, name: Token, methods: list[Function], static_methods: list[Function]) -> None:
+        self.span = span
+        self.name = name
+        self.methods = methods
+        self.static_methods = static_methods
 
     def accept(self, visitor: StmntVisitor) -> Any:
         return visitor.visit_class_stmnt(self)
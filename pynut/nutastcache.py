@@ -0,0 +1,72 @@
+import gc
+import os
+import pickle
+import sys
+from functools import lru_cache
+from typing import Optional
+from utils import SpanTable
+import nutast as at
+
+
+@lru_cache(maxsize=None)
+def interpreter_version() -> str:
+    """Changes whenever Python or any pynut module changes."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    parts = [sys.version]
+    for entry in sorted(os.scandir(here), key=lambda e: e.name):
+        if entry.name.endswith(".py"):
+            stat = entry.stat()
+            parts.append(f"{entry.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return "\n".join(parts)
+
+
+class ProgramCache:
+    """Resolved programs pickled into __nutcache__ next to the script, like __pycache__.
+
+    The file holds two pickles: a key of the interpreter version, a tag naming
+    the AST passes that ran and the source itself, then the statements with
+    the resolver's depth/slot already set on them and the SpanTable their
+    span ids refer to. Comparing the source directly is cheaper than
+    importing hashlib at startup and can't collide.
+    Any mismatch or unreadable file is a miss and failing to write is ignored.
+    """
+    DIRECTORY = "__nutcache__"
+
+    def __init__(self, filename: str, source: str, tag: str = "") -> None:
+        directory, name = os.path.split(os.path.abspath(filename))
+        # like .opt-1.pyc, each set of passes gets its own file
+        self.path = os.path.join(directory, self.DIRECTORY, f"{name}.{tag}.pickle" if tag else f"{name}.pickle")
+        self.key = (interpreter_version(), tag, source)
+
+    def load(self) -> Optional[tuple[list[at.Stmnt], SpanTable]]:
+        try:
+            with open(self.path, "rb") as f:
+                if pickle.load(f) != self.key:
+                    return None
+                # unpickling allocates the whole tree at once, keep the collector
+                # from scanning it over and over while it is rebuilt
+                enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    return pickle.load(f)
+                finally:
+                    if enabled:
+                        gc.enable()
+        except Exception:
+            # stale or corrupt, which unpickling can report as almost any error;
+            # the cache is only a shortcut, so the caller rebuilds and overwrites it
+            return None
+
+    def store(self, statements: list[at.Stmnt], spans: SpanTable) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                pickle.dump(self.key, f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump((statements, spans), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except (OSError, pickle.PicklingError, RecursionError):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
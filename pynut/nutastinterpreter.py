@@ -1,14 +1,16 @@
-from typing import Any,Union
-from utils import Context, Span
+from typing import Any, Optional, Union
+from utils import Context, SpanId
 from nutvisitor import ExprVisitor, StmntVisitor
 import nutast as at
 from nuttoken import Token, TokenType
-from contextlib import contextmanager, _GeneratorContextManager
 from nutcallable import NutCallable, NutNativeCallable, NutFunction
 import time
-from nuterror import InterpreterError, NutBreak, NutReturn
-from nutenvironment import Environment
+from nuterror import Completion, InterpreterError, NutBreak
+from nutenvironment import Environment, GlobalEnvironment
 from nutclass import NutClass, NutInstance
+from nutmemo import Memo
+from nutarray import NATIVES as ARRAY_NATIVES, NutArray
+from nutmap import NATIVES as MAP_NATIVES, INDEXABLE
 
 NutUnion = Union[float, str, None, NutCallable]
 
@@ -16,13 +18,23 @@ NutUnion = Union[float, str, None, NutCallable]
 class Interpreter(StmntVisitor, ExprVisitor):
     def __init__(self, context: Context):
         self.context = context
-        self.locals: dict[at.Expr, int] = {}
 
-        self.globals = Environment()
+        self.globals = GlobalEnvironment()
         self.globals.define("clock", NutNativeCallable(0, time.time))
-        self.globals.define("str", NutNativeCallable(1, str))
+        self.globals.define("str", NutNativeCallable(1, str, pure=True))
+        for name, (arity, function, pure) in {**ARRAY_NATIVES, **MAP_NATIVES}.items():
+            self.globals.define(name, NutNativeCallable(arity, function, pure=pure))
 
-        self.environment = self.globals
+        self.environment: Union[Environment, GlobalEnvironment] = self.globals
+
+        # set alongside Completion.RETURN / Completion.BREAK / Completion.TAIL_CALL
+        self.return_value: Any = None
+        self.break_span: Optional[SpanId] = None
+        self.tail_call: Optional[tuple[NutCallable, list]] = None
+
+        # LRU size for functions marked pure, None leaves them unmemoized
+        self.memo_size: Optional[int] = None
+        self.memos: list[Memo] = []
 
     def visit_literal_expr(self, expr: at.Literal) -> NutUnion:
         return expr.value
@@ -30,19 +42,27 @@ class Interpreter(StmntVisitor, ExprVisitor):
     def visit_grouping_expr(self, expr: at.Grouping) -> None:
         return self.evaluate(expr.expression)
 
-    def resolve(self, expr: at.Expr, depth: int) -> None:
-        self.locals[expr] = depth
+    def resolve(self, expr: Union[at.Variable, at.Assign, at.This], depth: int, slot: int) -> None:
+        expr.depth = depth
+        expr.slot = slot
+
+    def define(self, name: Token, value: Any) -> None:
+        if self.environment is self.globals:
+            self.globals.define(name.value, value)
+        else:
+            self.environment.define(value)
 
     def evaluate(self, expr: at.Expr) -> Any:
         return expr.accept(self)
 
-    def visit_break_stmnt(self, stmnt: 'at.Break') -> Any:
-        raise NutBreak(stmnt.span)
+    def visit_break_stmnt(self, stmnt: 'at.Break') -> Completion:
+        self.break_span = stmnt.span
+        return Completion.BREAK
 
     def visit_get_expr(self, expr: 'at.Get') -> Any:
         obj = self.evaluate(expr.object)
         if isinstance(obj, NutInstance):
-            return obj.get(expr.name.value, expr.name.span)
+            return obj.get(expr.name.value, expr.name.span, expr.cache)
         raise self.error(expr.span, "Only instances have properties")
 
     def visit_set_expr(self, expr: 'at.Set') -> Any:
@@ -52,10 +72,36 @@ class Interpreter(StmntVisitor, ExprVisitor):
             raise self.error(expr.span, "Only instances have fields")
 
         ev = self.evaluate(expr.value)
-        obj.set(expr.name.value, ev)
+        obj.set(expr.name.value, ev, expr.cache)
 
         return ev
     
+    def visit_array_expr(self, expr: 'at.ArrayLiteral') -> NutArray:
+        return NutArray.of([self.evaluate(element) for element in expr.elements])
+
+    def visit_index_expr(self, expr: 'at.Index') -> Any:
+        obj = self.evaluate(expr.object)
+        if not isinstance(obj, INDEXABLE):
+            raise self.error(expr.span, "Only arrays and maps can be indexed")
+        return obj.get(self.evaluate(expr.index), expr.span)
+
+    def visit_slice_expr(self, expr: 'at.Slice') -> NutArray:
+        obj = self.evaluate(expr.object)
+        if not isinstance(obj, NutArray):
+            raise self.error(expr.span, "Only arrays can be sliced")
+        start = None if expr.start is None else self.evaluate(expr.start)
+        end = None if expr.end is None else self.evaluate(expr.end)
+        return obj.slice(start, end, expr.span)
+
+    def visit_set_index_expr(self, expr: 'at.SetIndex') -> Any:
+        obj = self.evaluate(expr.object)
+        if not isinstance(obj, INDEXABLE):
+            raise self.error(expr.span, "Only arrays and maps can be indexed")
+        index = self.evaluate(expr.index)
+        value = self.evaluate(expr.value)
+        obj.set(index, value, expr.span)
+        return value
+
     def visit_unary_expr(self, expr: at.Unary) -> float:
         right = self.evaluate(expr.right)
 
@@ -67,9 +113,9 @@ class Interpreter(StmntVisitor, ExprVisitor):
             case TokenType.BANG:
                 return not right
             
-        raise self.error(expr.operator.span, f"Unknown operator {expr.operator.type}")
+        raise self.error(expr.operator.span, f"Unknown operator {expr.operator.type.name}")
 
-    def error(self, span: Span, message: str)  -> InterpreterError:
+    def error(self, span: SpanId, message: str)  -> InterpreterError:
         self.context.error_span(message, span)
         return InterpreterError(message)
 
@@ -80,21 +126,23 @@ class Interpreter(StmntVisitor, ExprVisitor):
             case TokenType.AND:
                 return self.evaluate(expr.left) and self.evaluate(expr.right)
 
-    def visit_while_stmnt(self, stmnt: 'at.While') -> Any:
+    def visit_while_stmnt(self, stmnt: 'at.While') -> Optional[Completion]:
         try:
             while(bool(self.evaluate(stmnt.condition))):
-                self.execute(stmnt.body)
+                if (completion := self.execute(stmnt.body)) is not None:
+                    return None if completion is Completion.BREAK else completion
         except NutBreak:
-            return
+            # raised by a break in a called function that has no loop of its own
+            return None
 
     
     def visit_assign_expr(self, expr: 'at.Assign') -> Any:
         value = self.evaluate(expr.value)
 
-        if expr in self.locals:
-            self.environment.assign_at(self.locals[expr], expr.name.value, value)
+        if expr.depth is not None:
+            self.environment.assign_at(expr.depth, expr.slot, value)
         else:
-            self.globals.assign(expr.name.value, value)
+            self.globals.set(expr.name.value, value, expr.name.span)
 
         return value
     
@@ -103,6 +151,14 @@ class Interpreter(StmntVisitor, ExprVisitor):
         self.evaluate(stmnt.expression)
 
     def visit_call_expr(self, expr: 'at.Call') -> Any:
+        calee, args = self.prepare_call(expr)
+        return calee.call(self, args, expr.span)
+
+    def prepare_call(self, expr: 'at.Call') -> tuple[NutCallable, list]:
+        """Evaluates the callee and arguments of expr and checks that they match."""
+        if type(expr.callee) is at.Get:
+            return self.prepare_invoke(expr, expr.callee)
+
         calee = self.evaluate(expr.callee)
         args = [self.evaluate(arg) for arg in expr.arguments]
 
@@ -112,18 +168,41 @@ class Interpreter(StmntVisitor, ExprVisitor):
         if calee.arity != (y := len(args)):
             raise self.error(expr.span, f"expected {calee.arity} args got {y}")
 
-        return calee.call(self, args, expr.span)
+        return calee, args
+
+    def prepare_invoke(self, expr: 'at.Call', callee: 'at.Get') -> tuple[NutCallable, list]:
+        # obj.name(args) calls the method with obj as its receiver, no bound method is made
+        obj = self.evaluate(callee.object)
+        if not isinstance(obj, NutInstance):
+            raise self.error(callee.span, "Only instances have properties")
+
+        if (method := obj.get_method(callee.name.value, callee.cache)) is not None:
+            args = [obj]
+            args.extend(self.evaluate(arg) for arg in expr.arguments)
+            if method.arity != (y := len(args) - 1):
+                raise self.error(expr.span, f"expected {method.arity} args got {y}")
+            return method, args
+
+        # a field holding a callable, or an undefined property
+        calee = obj.get(callee.name.value, callee.name.span)
+        args = [self.evaluate(arg) for arg in expr.arguments]
+
+        if not isinstance(calee, NutCallable):
+            raise self.error(expr.span, "Can only call functions and classes")
+
+        if calee.arity != (y := len(args)):
+            raise self.error(expr.span, f"expected {calee.arity} args got {y}")
+
+        return calee, args
 
     def visit_print_stmnt(self, stmnt: at.Print) -> None:
         value = self.evaluate(stmnt.expression)
         print(value)
 
     def visit_this_expr(self, expr: 'at.This') -> Any:
-        return self.environment.get(expr.this.value, expr.this.span)
+        return self.environment.get_at(expr.depth, expr.slot)
 
     def visit_class_stmnt(self, stmnt: 'at.Class') -> Any:
-        self.environment.define(stmnt.name.value, None)
-
         methods: dict[str, NutFunction] = {}
         static_methods: dict[str, NutFunction] = {}
         
@@ -136,51 +215,58 @@ class Interpreter(StmntVisitor, ExprVisitor):
             static_methods[method.name.value] = func
         
         _class = NutClass(stmnt.name.value, methods, static_methods)
-        self.environment.set(stmnt.name.value, _class)
+        self.define(stmnt.name, _class)
         
     def visit_function(self, stmnt: at.Function) -> None:
         func = NutFunction(stmnt, self.environment)
+        if stmnt.pure and self.memo_size is not None:
+            func.memo = Memo(stmnt.name.value, self.memo_size)
+            self.memos.append(func.memo)
 
         # if not self.environment.is_variable_unique(stmnt.name.value):
         #     raise self.error(stmnt.span, f"name '{stmnt.name.value}' for the function is already defined")
-        self.environment.define(stmnt.name.value, func)
+        self.define(stmnt.name, func)
 
-    def visit_if_stmnt(self, stmnt: 'at.If') -> Any:
+    def visit_if_stmnt(self, stmnt: 'at.If') -> Optional[Completion]:
         if bool(self.evaluate(stmnt.condition)):
-            self.execute(stmnt.then_branch)
+            return self.execute(stmnt.then_branch)
         elif stmnt.else_branch is not None:
-            self.execute(stmnt.else_branch)
+            return self.execute(stmnt.else_branch)
+        return None
 
-    def visit_return_stmnt(self, stmnt: at.Return) -> NutUnion:
-        raise NutReturn(self.evaluate(stmnt.value) if stmnt.value else None, stmnt.span)
+    def visit_return_stmnt(self, stmnt: at.Return) -> Completion:
+        if stmnt.tail:
+            # the caller's NutFunction.call makes the call in place of this frame
+            self.tail_call = self.prepare_call(stmnt.value)
+            return Completion.TAIL_CALL
 
+        self.return_value = self.evaluate(stmnt.value) if stmnt.value else None
+        return Completion.RETURN
 
-    @contextmanager
-    def new_environment(self, env: Environment) -> _GeneratorContextManager['Environment', None, None]:
+
+    def execute_block(self, statements: list[at.Stmnt], environment: Environment) -> Optional[Completion]:
         pre = self.environment
+        self.environment = environment
         try:
-            self.environment = env
-            yield env
+            for stmnt in statements:
+                if (completion := stmnt.accept(self)) is not None:
+                    return completion
+            return None
         finally:
             self.environment = pre
-
-
-    def execute_block(self, statements: list[at.Stmnt], environment: Environment) -> None:
-        with self.new_environment(environment):
-            for stmnt in statements:
-                self.execute(stmnt)
             
-    def visit_block_stmnt(self, stmnt: 'at.Block') -> Any:
-        self.execute_block(stmnt.statements, Environment(self.environment))
+    def visit_block_stmnt(self, stmnt: 'at.Block') -> Optional[Completion]:
+        return self.execute_block(stmnt.statements, Environment(self.environment))
 
-    def execute(self, stmnt: at.Stmnt) -> None:
-        stmnt.accept(self)
+    def execute(self, stmnt: at.Stmnt) -> Optional[Completion]:
+        """Runs stmnt, returning a Completion if it broke out of a loop or returned."""
+        return stmnt.accept(self)
                
     def check_number_operator(self, op: Token, oprand: object) -> None:
         if isinstance(oprand, float): return
         raise self.error(op.span, f"expected Number got {type(oprand)}")
 
-    def check_number_oprands(self, sp: Span, left: object, right: object) -> None:
+    def check_number_oprands(self, sp: SpanId, left: object, right: object) -> None:
         
         if not all(isinstance(x, (float, int)) for x in (left, right)):
             raise self.error(sp, f"Oprands must be numbers not {type(left)} and {type(right)}")
@@ -193,21 +279,20 @@ class Interpreter(StmntVisitor, ExprVisitor):
         #     raise self.error(stmnt.span, f"variable {stmnt.name.value} is already defined")
 
         value = None if stmnt.initializer is None else self.evaluate(stmnt.initializer)
-        self.environment.define(stmnt.name.value, value)
+        self.define(stmnt.name, value)
 
     def visit_variable_expr(self, expr: at.Variable) -> NutUnion:
-        distance = self.locals.get(expr, None)
-
-        if distance is not None:
-            return self.environment.get_at(distance, expr.name.value)
+        if expr.depth is not None:
+            return self.environment.get_at(expr.depth, expr.slot)
         return self.globals.get(expr.name.value, None)
 
     def interpret(self, statements: list[at.Stmnt]) -> None:
         try:
             for statement in statements:
-                self.execute(statement)
+                if self.execute(statement) is Completion.BREAK:
+                    raise NutBreak(self.break_span)
         except InterpreterError as e:
-            if e.span:
+            if e.span is not None:
                 self.context.error_span(e.error, e.span)
             else:
                 print(e.error)
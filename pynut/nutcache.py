@@ -0,0 +1,35 @@
+from typing import Any, Optional
+
+
+class InlineCache:
+    """A polymorphic inline cache for one property access site.
+
+    Entries are keyed by the receiver's Shape. Since a shape belongs to one
+    class and fixes the instance's field names, an entry can never go stale:
+    an instance that gains a field moves to a different shape and simply
+    misses.
+
+    Each entry is ``(shape, index, target)``. For a read ``target`` is the
+    method the name resolved to, or None when it is the field at ``index``.
+    For a write ``target`` is the shape the instance moves to when the field
+    is new, or None when ``index`` is an existing field.
+    """
+    __slots__ = ("entries",)
+
+    MAX_ENTRIES = 4
+
+    def __init__(self) -> None:
+        self.entries: list[tuple[Any, int, Any]] = []
+
+    def lookup(self, shape: Any) -> Optional[tuple[Any, int, Any]]:
+        for entry in self.entries:
+            if entry[0] is shape:
+                return entry
+        return None
+
+    def add(self, shape: Any, index: int, target: Any = None) -> None:
+        entries = self.entries
+        if len(entries) >= self.MAX_ENTRIES:
+            # megamorphic site, keep the most recent receivers
+            entries.pop(0)
+        entries.append((shape, index, target))
@@ -1,8 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Union
-from nuterror import NutReturn, InterpreterError
+from typing import Callable, Optional, Union
+from nuterror import Completion, InterpreterError, NutBreak
 from nutenvironment import Environment
-from utils import Span
+from utils import SpanId
 
 
 class NutCallable(ABC):
@@ -10,16 +10,18 @@ class NutCallable(ABC):
         self.arity = arity
 
     @abstractmethod
-    def call(self, interpreter, arguments, span: Span):
+    def call(self, interpreter, arguments, span: SpanId):
         ...
 
 
 class NutNativeCallable(NutCallable):
-    def __init__(self, arity: int, _callable: Callable[[], Union[float, str, None]]):
+    def __init__(self, arity: int, _callable: Callable[[], Union[float, str, None]], pure: bool = False):
         super().__init__(arity)
         self.callable = _callable
+        # the result only depends on the arguments
+        self.pure = pure
 
-    def call(self, interpreter, arguments, span: Span):
+    def call(self, interpreter, arguments, span: SpanId):
         try:
             return self.callable(*arguments)
         except Exception as e:
@@ -31,34 +33,78 @@ class NutNativeCallable(NutCallable):
 
 
 class NutFunction(NutCallable):
+    """A user defined function.
+
+    Methods take their receiver as an extra first argument, so 'this' lives in
+    slot 0 of the call frame followed by the parameters. ``arity`` does not
+    count the receiver.
+    """
+    # results cache for pure functions, see nutmemo
+    memo: Optional['Memo'] = None
+
     def __init__(self, function, closure: Environment, is_init=False):
         super().__init__(len(function.params))
         self.callable = function
         self.closure = closure
         self.is_init = is_init
 
-    def call(self, interpreter, arguments: list, span: Span):
-        env = Environment(self.closure)
+    def call(self, interpreter, arguments: list, span: SpanId):
+        if self.memo is not None and (key := self.memo.key(arguments)) is not None:
+            found, result = self.memo.lookup(key)
+            if not found:
+                result = self.run(interpreter, arguments, span)
+                self.memo.store(key, result)
+            return result
 
-        for idx, t in enumerate(self.callable.params):
-            env.define(t.value, arguments[idx])
-        try:
-            interpreter.execute_block(self.callable.body, env)
-        except NutReturn as e:
-            return self.closure.get_at(0, "this") if self.is_init else e.value
+        return self.run(interpreter, arguments, span)
+
+    def run(self, interpreter, arguments: list, span: SpanId):
+        function = self
+
+        while True:
+            # parameters occupy the first slots of the call frame, in order
+            env = Environment(function.closure, arguments)
+            completion = interpreter.execute_block(function.callable.body, env)
+
+            if completion is not Completion.TAIL_CALL:
+                break
+
+            # run tail calls to other tree-walked functions in this same loop
+            callee, arguments = interpreter.tail_call
+            if type(callee) is not NutFunction:
+                return callee.call(interpreter, arguments, span)
+            function = callee
 
+        if function.is_init:
+            return arguments[0]
 
-        if self.is_init:
-            return self.closure.get_at(0, "this")
+        if completion is Completion.RETURN:
+            return interpreter.return_value
 
-        return "baba"
+        if completion is Completion.BREAK:
+            # a break with no loop in this function unwinds into the caller
+            raise NutBreak(interpreter.break_span)
 
-    def bind(self, instance: 'NutInstance') -> 'NutFunction':
-        env = Environment(self.closure)
-        env.define("this", instance)
-        return NutFunction(self.callable, env, self.is_init)
+        return None
+
+    def bind(self, instance: 'NutInstance') -> 'NutBoundMethod':
+        return NutBoundMethod(self, instance)
 
     def __str__(self) -> str:
         return f"<function {self.callable.name.value}>"
 
+
+class NutBoundMethod(NutCallable):
+    """A method read off an instance as a value, e.g. `var f = p.move;`."""
+    def __init__(self, method: NutFunction, instance: 'NutInstance'):
+        super().__init__(method.arity)
+        self.method = method
+        self.instance = instance
+
+    def call(self, interpreter, arguments: list, span: SpanId):
+        return self.method.call(interpreter, [self.instance, *arguments], span)
+
+    def __str__(self) -> str:
+        return str(self.method)
+
 from nutclass import NutInstance
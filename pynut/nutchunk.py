@@ -0,0 +1,140 @@
+from array import array
+from enum import IntEnum, auto
+from typing import Any, Optional, Union
+from utils import SpanId
+
+
+class OpCode(IntEnum):
+    CONSTANT = 0
+    NIL = auto()
+    TRUE = auto()
+    FALSE = auto()
+    POP = auto()
+
+    GET_LOCAL = auto()
+    SET_LOCAL = auto()
+    DEFINE_LOCAL = auto()
+    GET_GLOBAL = auto()
+    SET_GLOBAL = auto()
+    DEFINE_GLOBAL = auto()
+    GET_PROPERTY = auto()
+    SET_PROPERTY = auto()
+    BUILD_ARRAY = auto()
+    GET_INDEX = auto()
+    SET_INDEX = auto()
+    SLICE = auto()
+
+    EQUAL = auto()
+    NOT_EQUAL = auto()
+    GREATER = auto()
+    GREATER_EQUAL = auto()
+    LESS = auto()
+    LESS_EQUAL = auto()
+    ADD = auto()
+    SUBTRACT = auto()
+    MULTIPLY = auto()
+    DIVIDE = auto()
+    NOT = auto()
+    NEGATE = auto()
+
+    PRINT = auto()
+    JUMP = auto()
+    JUMP_IF_FALSE = auto()
+    JUMP_IF_TRUE = auto()
+    POP_JUMP_IF_FALSE = auto()
+    BREAK_OUTSIDE_LOOP = auto()
+
+    PUSH_SCOPE = auto()
+    POP_SCOPE = auto()
+    CALL = auto()
+    CLOSURE = auto()
+    CLASS = auto()
+    RETURN = auto()
+
+
+# number of operands following each opcode
+OPERANDS = {op: 0 for op in OpCode}
+OPERANDS.update({
+    OpCode.CONSTANT: 1,
+    OpCode.GET_LOCAL: 2,
+    OpCode.SET_LOCAL: 2,
+    OpCode.GET_GLOBAL: 1,
+    OpCode.SET_GLOBAL: 1,
+    OpCode.DEFINE_GLOBAL: 1,
+    OpCode.GET_PROPERTY: 1,
+    OpCode.SET_PROPERTY: 1,
+    OpCode.BUILD_ARRAY: 1,
+    OpCode.JUMP: 1,
+    OpCode.JUMP_IF_FALSE: 1,
+    OpCode.JUMP_IF_TRUE: 1,
+    OpCode.POP_JUMP_IF_FALSE: 1,
+    OpCode.CALL: 1,
+    OpCode.CLOSURE: 1,
+    OpCode.CLASS: 1,
+})
+
+
+class Chunk:
+    """A compiled unit of bytecode.
+
+    Opcodes and their operands are stored as words in ``code``, with the
+    source line of every word in ``lines``. Instructions that can fail at
+    runtime record their span id in ``spans``, keyed by the offset just past
+    the instruction, which is where ``ip`` points when the VM reports the error.
+    Calls made inside a loop map the same offset to the loop's exit and the
+    scopes to pop on the way there in ``loop_exits``, for a break in the
+    called function.
+    """
+    __slots__ = ("name", "code", "lines", "constants", "indexes", "spans", "loop_exits")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.code = array("I")
+        self.lines = array("I")
+        self.constants: list[Any] = []
+        # (type, value) -> index in constants, for the plain values that are deduped
+        self.indexes: dict[tuple[type, Any], int] = {}
+        self.spans: dict[int, Union[SpanId, tuple[SpanId, SpanId]]] = {}
+        self.loop_exits: dict[int, tuple[int, int]] = {}
+
+    def write(self, word: int, line: int) -> None:
+        self.code.append(word)
+        self.lines.append(line)
+
+    def add_constant(self, value: Any) -> int:
+        # only dedupe plain values, functions and classes are always distinct
+        if isinstance(value, (str, float)):
+            key = (type(value), value)
+            if (idx := self.indexes.get(key)) is not None:
+                return idx
+            self.indexes[key] = len(self.constants)
+
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def disassemble(self) -> str:
+        out = [f"=== {self.name} ==="]
+        offset = 0
+        pre_line: Optional[int] = None
+
+        while offset < len(self.code):
+            op = OpCode(self.code[offset])
+            operands = list(self.code[offset + 1: offset + 1 + OPERANDS[op]])
+            line = self.lines[offset]
+            where = "     |" if line == pre_line else f"{line:>6}"
+            pre_line = line
+
+            text = f"{offset:04} {where} {op.name:<18} {' '.join(str(x) for x in operands)}"
+            if op in (OpCode.CONSTANT, OpCode.GET_GLOBAL, OpCode.SET_GLOBAL, OpCode.DEFINE_GLOBAL,
+                      OpCode.GET_PROPERTY, OpCode.SET_PROPERTY, OpCode.CLOSURE, OpCode.CLASS):
+                text += f" '{self.constants[operands[0]]}'"
+            out.append(text.rstrip())
+            offset += 1 + OPERANDS[op]
+
+        for constant in self.constants:
+            if hasattr(constant, "chunk"):
+                out.append(constant.chunk.disassemble())
+            for method in getattr(constant, "methods", ()) + getattr(constant, "static_methods", ()):
+                out.append(method.chunk.disassemble())
+
+        return "\n".join(out)
@@ -1,36 +1,112 @@
 from nutcallable import NutCallable
-from utils import Span
-from typing import Any
+from utils import SpanId
+from typing import Any, Optional
+from nutcache import InlineCache
 from nuterror import InterpreterError
 
 
+class Shape:
+    """The field layout shared by instances that gained the same fields in the same order.
+
+    Maps each field name to its index in NutInstance.values. Adding a field
+    follows (or creates) a transition to the next shape, so instances built
+    the same way end up sharing one Shape. Every class has its own root shape,
+    which makes a shape identify the class as well.
+    """
+    __slots__ = ("fields", "transitions")
+
+    def __init__(self, fields: Optional[dict[str, int]] = None) -> None:
+        self.fields: dict[str, int] = fields if fields is not None else {}
+        self.transitions: dict[str, Shape] = {}
+
+    def add(self, name: str) -> 'Shape':
+        if (shape := self.transitions.get(name)) is None:
+            shape = Shape({**self.fields, name: len(self.fields)})
+            self.transitions[name] = shape
+        return shape
+
+
 class NutInstance:
+    __slots__ = ("_class", "shape", "values")
+
     def __init__(self, _class: 'NutClass') -> None:
         self._class = _class
-        self.fields: dict[str, Any] = {}
+        self.shape: Shape = _class.root
+        self.values: list[Any] = []
+
+    @property
+    def fields(self) -> dict[str, Any]:
+        return {name: self.values[idx] for name, idx in self.shape.fields.items()}
 
     def __str__(self) -> str:
         return f"{self._class.name}({', '.join(f'{k}={v}' for k, v in self.fields.items())})"
 
-    def get(self, name: str, span=None) -> Any:
-        if name in self.fields:
-            return self.fields[name]
+    def get_method(self, name: str, cache: Optional[InlineCache] = None) -> Optional[NutCallable]:
+        """The unbound method name refers to, or None if it is a field or undefined."""
+        shape = self.shape
+        if cache is not None and (entry := cache.lookup(shape)) is not None:
+            return entry[2]
+
+        if (idx := shape.fields.get(name)) is not None:
+            if cache is not None:
+                cache.add(shape, idx)
+            return None
+
+        if (meth := self._class.find_method(name)) is not None and cache is not None:
+            cache.add(shape, -1, meth)
+        return meth
+
+    def get(self, name: str, span=None, cache: Optional[InlineCache] = None) -> Any:
+        shape = self.shape
+        if cache is not None:
+            for s, idx, meth in cache.entries:
+                if s is shape:
+                    return self.values[idx] if meth is None else meth.bind(self)
+
+        if (idx := shape.fields.get(name)) is not None:
+            if cache is not None:
+                cache.add(shape, idx)
+            return self.values[idx]
         
         if (meth := self._class.find_method(name)) is not None:
+            if cache is not None:
+                cache.add(shape, -1, meth)
             return meth.bind(self)
 
         raise InterpreterError(f"Undefined property '{name}'.", span=span)
         
-    def set(self, name: str, value: Any) -> None:
-        self.fields[name] = value
+    def set(self, name: str, value: Any, cache: Optional[InlineCache] = None) -> None:
+        shape = self.shape
+        if cache is not None:
+            for s, idx, next_shape in cache.entries:
+                if s is shape:
+                    if next_shape is None:
+                        self.values[idx] = value
+                    else:
+                        self.shape = next_shape
+                        self.values.append(value)
+                    return
+
+        if (idx := shape.fields.get(name)) is not None:
+            if cache is not None:
+                cache.add(shape, idx)
+            self.values[idx] = value
+            return
+
+        self.shape = shape.add(name)
+        if cache is not None:
+            cache.add(shape, len(self.values), self.shape)
+        self.values.append(value)
 
     
 class NutClass(NutInstance, NutCallable):
     def __init__(self, name: str, methods: dict[str, NutCallable], static_methods: dict[str, NutCallable]) -> None:
+        self.root = Shape()
         super().__init__(self)
         self.name = name
         self.methods: dict[str, NutCallable] = methods
-        self.fields = static_methods
+        for meth_name, meth in static_methods.items():
+            self.set(meth_name, meth)
 
     @property
     def arity(self):
@@ -40,12 +116,12 @@ class NutClass(NutInstance, NutCallable):
         if meth in self.methods:
             return self.methods[meth]
 
-    def call(self, interpreter, arguments, span: Span):
+    def call(self, interpreter, arguments, span: SpanId):
         instance = NutInstance(self)
 
         
         if (meth := self.find_method("init")) is not None:
-            return meth.bind(instance).call(interpreter, arguments, span)  
+            return meth.call(interpreter, [instance, *arguments], span)
         else:
             return instance
 
@@ -0,0 +1,561 @@
+import operator
+from typing import Any, Callable, Optional
+from utils import Context, SpanId
+from nutvisitor import ExprVisitor, StmntVisitor
+import nutast as at
+from nuttoken import TokenType
+from nutcallable import NutCallable, NutFunction
+from nuterror import Completion, NutBreak
+from nutenvironment import Environment
+from nutclass import NutClass, NutInstance
+from nutarray import NutArray
+from nutmap import INDEXABLE
+from nutastinterpreter import Interpreter
+
+# a compiled node takes the current environment. Expressions return their
+# value; statements return a Completion if they broke out of a loop or
+# returned, as the tree interpreter's execute does, and otherwise whatever is
+# cheapest (an expression statement returns the expression's value)
+Code = Callable[[Any], Any]
+
+
+class CompiledFunction(NutFunction):
+    def __init__(self, function: at.Function, closure, body: list[Code], is_init=False):
+        super().__init__(function, closure, is_init)
+        self.body = body
+
+    def call(self, interpreter, arguments: list, span: SpanId):
+        function = self
+
+        while True:
+            env = Environment(function.closure, arguments)
+            completion = None
+            for stmnt in function.body:
+                if type(completion := stmnt(env)) is Completion:
+                    break
+
+            if completion is not Completion.TAIL_CALL:
+                break
+
+            # run tail calls to other compiled functions in this same loop
+            callee, arguments = interpreter.tail_call
+            if type(callee) is not CompiledFunction:
+                return callee.call(interpreter, arguments, span)
+            function = callee
+
+        if function.is_init:
+            return arguments[0]
+
+        if completion is Completion.RETURN:
+            return interpreter.return_value
+
+        if completion is Completion.BREAK:
+            # a break with no loop in this function unwinds into the caller
+            raise NutBreak(interpreter.break_span)
+
+        return None
+
+
+class ClosureCompiler(ExprVisitor, StmntVisitor):
+    """Turns a resolved AST into a tree of Python closures.
+
+    Every visit method returns a closure that is already specialised for its
+    node (operator, resolved slot, argument count), so running the program
+    never goes back through accept/visit dispatch.
+    """
+
+    def __init__(self, interpreter: 'ClosureInterpreter') -> None:
+        self.interpreter = interpreter
+        self.scope_depth = 0
+
+    def compile(self, node: at.Node) -> Code:
+        return node.accept(self)
+
+    def compile_block(self, statements: list[at.Stmnt]) -> list[Code]:
+        self.scope_depth += 1
+        try:
+            return [self.compile(s) for s in statements]
+        finally:
+            self.scope_depth -= 1
+
+    def define(self, name: str) -> Callable[[Any, Any], None]:
+        if self.scope_depth == 0:
+            globals_ = self.interpreter.globals.values
+
+            def define(env, value):
+                globals_[name] = value
+        else:
+            def define(env, value):
+                env.values.append(value)
+        return define
+
+    def load(self, name: str, depth, slot: int) -> Code:
+        if depth is None:
+            get = self.interpreter.globals.get
+            return lambda env: get(name, None)
+        if depth == 0:
+            return lambda env: env.values[slot]
+        if depth == 1:
+            return lambda env: env.enclosing.values[slot]
+        return lambda env: env.ancestor(depth).values[slot]
+
+    def visit_literal_expr(self, expr: at.Literal) -> Code:
+        value = expr.value
+        return lambda env: value
+
+    def visit_grouping_expr(self, expr: at.Grouping) -> Code:
+        return self.compile(expr.expression)
+
+    def visit_variable_expr(self, expr: at.Variable) -> Code:
+        return self.load(expr.name.value, expr.depth, expr.slot)
+
+    def visit_this_expr(self, expr: at.This) -> Code:
+        return self.load(expr.this.value, expr.depth, expr.slot)
+
+    def visit_assign_expr(self, expr: at.Assign) -> Code:
+        value = self.compile(expr.value)
+        depth, slot = expr.depth, expr.slot
+
+        if depth is None:
+            name, span = expr.name.value, expr.name.span
+            set_ = self.interpreter.globals.set
+
+            def assign(env):
+                v = value(env)
+                set_(name, v, span)
+                return v
+        elif depth == 0:
+            def assign(env):
+                v = env.values[slot] = value(env)
+                return v
+        else:
+            def assign(env):
+                v = env.ancestor(depth).values[slot] = value(env)
+                return v
+        return assign
+
+    def visit_unary_expr(self, expr: at.Unary) -> Code:
+        right = self.compile(expr.right)
+        op = expr.operator
+        check = self.interpreter.check_number_operator
+
+        match op.type:
+            case TokenType.MINUS:
+                def negate(env):
+                    r = right(env)
+                    check(op, r)
+                    return -r
+                return negate
+
+            case TokenType.BANG:
+                return lambda env: not right(env)
+
+        raise self.interpreter.error(op.span, f"Unknown operator {op.type.name}")
+
+    def visit_binary_expr(self, expr: at.Binary) -> Code:
+        left = self.compile(expr.left)
+        right = self.compile(expr.right)
+        span = expr.span
+        intp = self.interpreter
+
+        match expr.operator.type:
+            case TokenType.PLUS:
+                def add(env):
+                    l, r = left(env), right(env)
+                    if (isinstance(l, float) and isinstance(r, float)) or (isinstance(l, str) and isinstance(r, str)):
+                        return l + r
+                    raise intp.error(span, f"Oprands must be of type number or string, not {type(l)} and {type(r)}")
+                return add
+
+            case TokenType.EQUAL_EQUAL:
+                return lambda env: left(env) == right(env)
+            case TokenType.BANG_EQUAL:
+                return lambda env: left(env) != right(env)
+            case TokenType.AND:
+                return lambda env: left(env) and right(env)
+            case TokenType.OR:
+                return lambda env: left(env) or right(env)
+
+        op = _NUMERIC_OPERATORS[expr.operator.type]
+        check = intp.check_number_oprands
+
+        def numeric(env):
+            l, r = left(env), right(env)
+            if l.__class__ is not float or r.__class__ is not float:
+                check(span, l, r)
+            return op(l, r)
+        return numeric
+
+    def visit_logical_expr(self, expr: at.Logical) -> Code:
+        left = self.compile(expr.left)
+        right = self.compile(expr.right)
+
+        match expr.operator.type:
+            case TokenType.OR:
+                return lambda env: left(env) or right(env)
+            case TokenType.AND:
+                return lambda env: left(env) and right(env)
+
+    def evaluate_args(self, arguments: list[Code]) -> Code:
+        match arguments:
+            case []:
+                return lambda env: []
+            case [a0]:
+                return lambda env: [a0(env)]
+            case [a0, a1]:
+                return lambda env: [a0(env), a1(env)]
+            case _:
+                return lambda env: [arg(env) for arg in arguments]
+
+    def receiver_args(self, arguments: list[Code]) -> Callable[[Any, Any], list]:
+        match arguments:
+            case []:
+                return lambda o, env: [o]
+            case [a0]:
+                return lambda o, env: [o, a0(env)]
+            case [a0, a1]:
+                return lambda o, env: [o, a0(env), a1(env)]
+            case _:
+                return lambda o, env: [o, *[arg(env) for arg in arguments]]
+
+    def visit_call_expr(self, expr: at.Call) -> Code:
+        arguments = [self.compile(arg) for arg in expr.arguments]
+        evaluate_args = self.evaluate_args(arguments)
+        span = expr.span
+        intp = self.interpreter
+
+        if type(expr.callee) is at.Get:
+            return self.invoke(expr, expr.callee, arguments, evaluate_args)
+
+        callee = self.compile(expr.callee)
+
+        def call(env):
+            f = callee(env)
+            args = evaluate_args(env)
+
+            if not isinstance(f, NutCallable):
+                raise intp.error(span, "Can only call functions and classes")
+
+            if f.arity != (y := len(args)):
+                raise intp.error(span, f"expected {f.arity} args got {y}")
+
+            return f.call(intp, args, span)
+        return call
+
+    def invoke(self, expr: at.Call, callee: at.Get, arguments: list[Code], evaluate_args: Code) -> Code:
+        # obj.name(args) calls the method with obj as its receiver, no bound method is made
+        obj = self.compile(callee.object)
+        name, name_span, get_span, cache = callee.name.value, callee.name.span, callee.span, callee.cache
+        span, argc = expr.span, len(expr.arguments)
+        intp = self.interpreter
+        receiver_args = self.receiver_args(arguments)
+
+        def invoke(env):
+            o = obj(env)
+            if not isinstance(o, NutInstance):
+                raise intp.error(get_span, "Only instances have properties")
+
+            if (method := o.get_method(name, cache)) is not None:
+                if method.arity != argc:
+                    evaluate_args(env)
+                    raise intp.error(span, f"expected {method.arity} args got {argc}")
+                return method.call(intp, receiver_args(o, env), span)
+
+            f = o.get(name, name_span)
+            args = evaluate_args(env)
+
+            if not isinstance(f, NutCallable):
+                raise intp.error(span, "Can only call functions and classes")
+
+            if f.arity != argc:
+                raise intp.error(span, f"expected {f.arity} args got {argc}")
+
+            return f.call(intp, args, span)
+        return invoke
+
+    def visit_get_expr(self, expr: at.Get) -> Code:
+        obj = self.compile(expr.object)
+        name, name_span, span, cache = expr.name.value, expr.name.span, expr.span, expr.cache
+        intp = self.interpreter
+
+        def get(env):
+            o = obj(env)
+            if isinstance(o, NutInstance):
+                return o.get(name, name_span, cache)
+            raise intp.error(span, "Only instances have properties")
+        return get
+
+    def visit_set_expr(self, expr: at.Set) -> Code:
+        obj = self.compile(expr.object)
+        value = self.compile(expr.value)
+        name, span, cache = expr.name.value, expr.span, expr.cache
+        intp = self.interpreter
+
+        def set_(env):
+            o = obj(env)
+            if not isinstance(o, NutInstance):
+                raise intp.error(span, "Only instances have fields")
+            v = value(env)
+            o.set(name, v, cache)
+            return v
+        return set_
+
+    def visit_array_expr(self, expr: at.ArrayLiteral) -> Code:
+        elements = [self.compile(element) for element in expr.elements]
+        of = NutArray.of
+        return lambda env: of([element(env) for element in elements])
+
+    def visit_index_expr(self, expr: at.Index) -> Code:
+        obj = self.compile(expr.object)
+        index = self.compile(expr.index)
+        span = expr.span
+        intp = self.interpreter
+
+        def get_index(env):
+            o = obj(env)
+            if isinstance(o, INDEXABLE):
+                return o.get(index(env), span)
+            raise intp.error(span, "Only arrays and maps can be indexed")
+        return get_index
+
+    def visit_slice_expr(self, expr: at.Slice) -> Code:
+        obj = self.compile(expr.object)
+        start = (lambda env: None) if expr.start is None else self.compile(expr.start)
+        end = (lambda env: None) if expr.end is None else self.compile(expr.end)
+        span = expr.span
+        intp = self.interpreter
+
+        def slice_(env):
+            o = obj(env)
+            if isinstance(o, NutArray):
+                return o.slice(start(env), end(env), span)
+            raise intp.error(span, "Only arrays can be sliced")
+        return slice_
+
+    def visit_set_index_expr(self, expr: at.SetIndex) -> Code:
+        obj = self.compile(expr.object)
+        index = self.compile(expr.index)
+        value = self.compile(expr.value)
+        span = expr.span
+        intp = self.interpreter
+
+        def set_index(env):
+            o = obj(env)
+            if not isinstance(o, INDEXABLE):
+                raise intp.error(span, "Only arrays and maps can be indexed")
+            i = index(env)
+            v = value(env)
+            o.set(i, v, span)
+            return v
+        return set_index
+
+    def visit_expression_stmnt(self, stmnt: at.Expression) -> Code:
+        return self.compile(stmnt.expression)
+
+    def visit_print_stmnt(self, stmnt: at.Print) -> Code:
+        value = self.compile(stmnt.expression)
+        return lambda env: print(value(env))
+
+    def visit_var_stmnt(self, stmnt: at.Var) -> Code:
+        define = self.define(stmnt.name.value)
+
+        if stmnt.initializer is None:
+            return lambda env: define(env, None)
+
+        initializer = self.compile(stmnt.initializer)
+        return lambda env: define(env, initializer(env))
+
+    def visit_block_stmnt(self, stmnt: at.Block) -> Code:
+        body = self.compile_block(stmnt.statements)
+
+        if not any(completes(s) for s in stmnt.statements):
+            def block(env):
+                env = Environment(env)
+                for s in body:
+                    s(env)
+            return block
+
+        def block_completing(env):
+            env = Environment(env)
+            for s in body:
+                if type(completion := s(env)) is Completion:
+                    return completion
+        return block_completing
+
+    def visit_if_stmnt(self, stmnt: at.If) -> Code:
+        condition = self.compile(stmnt.condition)
+        then_branch = self.compile(stmnt.then_branch)
+
+        if stmnt.else_branch is None:
+            def if_(env):
+                if condition(env):
+                    return then_branch(env)
+            return if_
+
+        else_branch = self.compile(stmnt.else_branch)
+
+        def if_else(env):
+            if condition(env):
+                return then_branch(env)
+            return else_branch(env)
+        return if_else
+
+    def visit_while_stmnt(self, stmnt: at.While) -> Code:
+        condition = self.compile(stmnt.condition)
+        body = self.compile(stmnt.body)
+
+        if not completes(stmnt.body):
+            def while_(env):
+                try:
+                    while condition(env):
+                        body(env)
+                except NutBreak:
+                    # raised by a break in a called function that has no loop of its own
+                    return None
+            return while_
+
+        def while_completing(env):
+            try:
+                while condition(env):
+                    if type(completion := body(env)) is Completion:
+                        return None if completion is Completion.BREAK else completion
+            except NutBreak:
+                return None
+        return while_completing
+
+    def visit_break_stmnt(self, stmnt: at.Break) -> Code:
+        span = stmnt.span
+        intp = self.interpreter
+
+        def break_(env):
+            intp.break_span = span
+            return Completion.BREAK
+        return break_
+
+    def visit_return_stmnt(self, stmnt: at.Return) -> Code:
+        intp = self.interpreter
+        if not stmnt.value:
+            def return_nil(env):
+                intp.return_value = None
+                return Completion.RETURN
+            return return_nil
+
+        if stmnt.tail:
+            # the caller's CompiledFunction.call makes the call in place of this frame
+            prepare = self.prepare_call(stmnt.value)
+
+            def return_call(env):
+                intp.tail_call = prepare(env)
+                return Completion.TAIL_CALL
+            return return_call
+
+        value = self.compile(stmnt.value)
+
+        def return_(env):
+            intp.return_value = value(env)
+            return Completion.RETURN
+        return return_
+
+    def prepare_call(self, expr: at.Call) -> Code:
+        """Compiles expr to evaluate its callee and arguments, check they match and return both."""
+        arguments = [self.compile(arg) for arg in expr.arguments]
+        span, argc = expr.span, len(expr.arguments)
+        intp = self.interpreter
+        evaluate_args = self.evaluate_args(arguments)
+
+        if type(expr.callee) is not at.Get:
+            callee = self.compile(expr.callee)
+
+            def prepare(env):
+                f = callee(env)
+                args = evaluate_args(env)
+
+                if not isinstance(f, NutCallable):
+                    raise intp.error(span, "Can only call functions and classes")
+
+                if f.arity != (y := len(args)):
+                    raise intp.error(span, f"expected {f.arity} args got {y}")
+
+                return f, args
+            return prepare
+
+        get = expr.callee
+        obj = self.compile(get.object)
+        name, name_span, get_span, cache = get.name.value, get.name.span, get.span, get.cache
+        receiver_args = self.receiver_args(arguments)
+
+        def prepare_invoke(env):
+            o = obj(env)
+            if not isinstance(o, NutInstance):
+                raise intp.error(get_span, "Only instances have properties")
+
+            if (method := o.get_method(name, cache)) is not None:
+                if method.arity != argc:
+                    evaluate_args(env)
+                    raise intp.error(span, f"expected {method.arity} args got {argc}")
+                return method, receiver_args(o, env)
+
+            f = o.get(name, name_span)
+            args = evaluate_args(env)
+
+            if not isinstance(f, NutCallable):
+                raise intp.error(span, "Can only call functions and classes")
+
+            if f.arity != argc:
+                raise intp.error(span, f"expected {f.arity} args got {argc}")
+
+            return f, args
+        return prepare_invoke
+
+    def visit_function(self, stmnt: at.Function) -> Code:
+        define = self.define(stmnt.name.value)
+        body = self.compile_block(stmnt.body)
+        return lambda env: define(env, CompiledFunction(stmnt, env, body))
+
+    def visit_class_stmnt(self, stmnt: at.Class) -> Code:
+        define = self.define(stmnt.name.value)
+        name = stmnt.name.value
+        methods = [(m, self.compile_block(m.body)) for m in stmnt.methods]
+        static_methods = [(m, self.compile_block(m.body)) for m in stmnt.static_methods]
+
+        def class_(env):
+            _methods = {m.name.value: CompiledFunction(m, env, body, m.name.value == "init") for m, body in methods}
+            _static = {m.name.value: CompiledFunction(m, env, body) for m, body in static_methods}
+            define(env, NutClass(name, _methods, _static))
+        return class_
+
+
+def completes(stmnt: at.Stmnt) -> bool:
+    """Whether stmnt can break out of a loop or return, so its Completion has to be checked."""
+    match stmnt:
+        case at.Return() | at.Break():
+            return True
+        case at.Block():
+            return any(completes(s) for s in stmnt.statements)
+        case at.If():
+            return completes(stmnt.then_branch) or (stmnt.else_branch is not None and completes(stmnt.else_branch))
+        case at.While():
+            return completes(stmnt.body)
+    return False
+
+
+_NUMERIC_OPERATORS = {
+    TokenType.MINUS: operator.sub,
+    TokenType.SLASH: operator.truediv,
+    TokenType.STAR: operator.mul,
+    TokenType.GREATER: operator.gt,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.GREATER_EQUAL: operator.ge,
+}
+
+
+class ClosureInterpreter(Interpreter):
+    """Runs programs by compiling each top-level statement to closures first."""
+
+    def __init__(self, context: Context):
+        super().__init__(context)
+        self.compiler = ClosureCompiler(self)
+
+    def execute(self, stmnt: at.Stmnt) -> Optional[Completion]:
+        return self.compiler.compile(stmnt)(self.globals)
@@ -0,0 +1,295 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+from nutvisitor import ExprVisitor, StmntVisitor
+from nutchunk import Chunk, OpCode
+from nuttoken import TokenType
+from utils import Context, SpanId
+import nutast as at
+
+
+@dataclass(eq=False)
+class FunctionProto:
+    name: str
+    arity: int
+    chunk: Chunk
+    node: at.Function
+    is_init: bool = False
+
+    def __str__(self) -> str:
+        return f"<fn {self.name}>"
+
+
+@dataclass(eq=False)
+class ClassProto:
+    name: str
+    methods: tuple[FunctionProto, ...]
+    static_methods: tuple[FunctionProto, ...]
+
+    def __str__(self) -> str:
+        return f"<class {self.name}>"
+
+
+_BINARY = {
+    TokenType.PLUS: OpCode.ADD,
+    TokenType.MINUS: OpCode.SUBTRACT,
+    TokenType.STAR: OpCode.MULTIPLY,
+    TokenType.SLASH: OpCode.DIVIDE,
+    TokenType.EQUAL_EQUAL: OpCode.EQUAL,
+    TokenType.BANG_EQUAL: OpCode.NOT_EQUAL,
+    TokenType.GREATER: OpCode.GREATER,
+    TokenType.GREATER_EQUAL: OpCode.GREATER_EQUAL,
+    TokenType.LESS: OpCode.LESS,
+    TokenType.LESS_EQUAL: OpCode.LESS_EQUAL,
+}
+
+
+class Compiler(ExprVisitor, StmntVisitor):
+    """Compiles a resolved AST into Chunks for the VM.
+
+    Scoping follows the tree-walking interpreter exactly: every block and
+    call gets its own Environment frame and locals are addressed by the
+    (depth, slot) the resolver stored on the node. Globals stay late bound
+    and are looked up by name.
+    """
+
+    def __init__(self, context: Optional[Context]) -> None:
+        self.context = context
+        self.chunk = Chunk("<script>")
+        self.line = 1
+        self.scope_depth = 0
+        # scope depth at the start of each enclosing loop, its pending break jumps
+        # and the calls made in it, each as the offset past the CALL and its scope depth
+        self.loops: list[tuple[int, list[int], list[tuple[int, int]]]] = []
+
+    def compile(self, statements: list[at.Stmnt], name: str = "<script>") -> Chunk:
+        self.chunk = Chunk(name)
+        for stmnt in statements:
+            self.compile_node(stmnt)
+        self.emit(OpCode.NIL)
+        self.emit(OpCode.RETURN)
+        return self.chunk
+
+    def compile_node(self, node: at.Node) -> None:
+        if node.span is not None:
+            self.line = self.context.spans.lines[node.span]
+        node.accept(self)
+
+    def emit(self, op: OpCode, *operands: int, span: Optional[SpanId] = None) -> int:
+        chunk = self.chunk
+        chunk.write(op, self.line)
+        for operand in operands:
+            chunk.write(operand, self.line)
+        if span is not None:
+            chunk.spans[len(chunk.code)] = span
+        return len(chunk.code) - 1
+
+    def emit_constant(self, value: Any) -> None:
+        self.emit(OpCode.CONSTANT, self.chunk.add_constant(value))
+
+    def emit_jump(self, op: OpCode) -> int:
+        return self.emit(op, 0)
+
+    def patch_jump(self, operand: int) -> None:
+        self.chunk.code[operand] = len(self.chunk.code)
+
+    def define(self, name: str) -> None:
+        if self.scope_depth == 0:
+            self.emit(OpCode.DEFINE_GLOBAL, self.chunk.add_constant(name))
+        else:
+            self.emit(OpCode.DEFINE_LOCAL)
+
+    def load(self, name: str, depth: Optional[int], slot: int, span: SpanId) -> None:
+        if depth is None:
+            self.emit(OpCode.GET_GLOBAL, self.chunk.add_constant(name), span=span)
+        else:
+            self.emit(OpCode.GET_LOCAL, depth, slot)
+
+    def compile_function(self, stmnt: at.Function, is_init: bool = False) -> FunctionProto:
+        enclosing = self.chunk, self.scope_depth, self.loops, self.line
+        self.chunk = Chunk(stmnt.name.value)
+        self.scope_depth = 1
+        self.loops = []
+
+        for s in stmnt.body:
+            self.compile_node(s)
+        self.emit(OpCode.NIL)
+        self.emit(OpCode.RETURN)
+
+        proto = FunctionProto(stmnt.name.value, len(stmnt.params), self.chunk, stmnt, is_init)
+        self.chunk, self.scope_depth, self.loops, self.line = enclosing
+        return proto
+
+    def visit_literal_expr(self, expr: at.Literal) -> None:
+        if expr.value is None:
+            self.emit(OpCode.NIL)
+        elif expr.value is True:
+            self.emit(OpCode.TRUE)
+        elif expr.value is False:
+            self.emit(OpCode.FALSE)
+        else:
+            self.emit_constant(expr.value)
+
+    def visit_grouping_expr(self, expr: at.Grouping) -> None:
+        self.compile_node(expr.expression)
+
+    def visit_variable_expr(self, expr: at.Variable) -> None:
+        self.load(expr.name.value, expr.depth, expr.slot, expr.name.span)
+
+    def visit_this_expr(self, expr: at.This) -> None:
+        self.load(expr.this.value, expr.depth, expr.slot, expr.this.span)
+
+    def visit_assign_expr(self, expr: at.Assign) -> None:
+        self.compile_node(expr.value)
+        if expr.depth is None:
+            self.emit(OpCode.SET_GLOBAL, self.chunk.add_constant(expr.name.value), span=expr.name.span)
+        else:
+            self.emit(OpCode.SET_LOCAL, expr.depth, expr.slot)
+
+    def visit_unary_expr(self, expr: at.Unary) -> None:
+        self.compile_node(expr.right)
+        if expr.operator.type is TokenType.MINUS:
+            self.emit(OpCode.NEGATE, span=expr.operator.span)
+        else:
+            self.emit(OpCode.NOT)
+
+    def visit_binary_expr(self, expr: at.Binary) -> None:
+        self.compile_node(expr.left)
+        self.compile_node(expr.right)
+        self.emit(_BINARY[expr.operator.type], span=expr.span)
+
+    def visit_logical_expr(self, expr: at.Logical) -> None:
+        self.compile_node(expr.left)
+        end = self.emit_jump(OpCode.JUMP_IF_TRUE if expr.operator.type is TokenType.OR else OpCode.JUMP_IF_FALSE)
+        self.emit(OpCode.POP)
+        self.compile_node(expr.right)
+        self.patch_jump(end)
+
+    def visit_call_expr(self, expr: at.Call) -> None:
+        self.compile_node(expr.callee)
+        for arg in expr.arguments:
+            self.compile_node(arg)
+        self.emit(OpCode.CALL, len(expr.arguments), span=expr.span)
+        if self.loops:
+            self.loops[-1][2].append((len(self.chunk.code), self.scope_depth))
+
+    def visit_get_expr(self, expr: at.Get) -> None:
+        self.compile_node(expr.object)
+        self.emit(OpCode.GET_PROPERTY, self.chunk.add_constant(expr.name.value))
+        # a lookup can fail on the receiver or on the name, each reported at its own span
+        self.chunk.spans[len(self.chunk.code)] = (expr.span, expr.name.span)
+
+    def visit_set_expr(self, expr: at.Set) -> None:
+        self.compile_node(expr.object)
+        self.compile_node(expr.value)
+        self.emit(OpCode.SET_PROPERTY, self.chunk.add_constant(expr.name.value), span=expr.span)
+
+    def visit_array_expr(self, expr: at.ArrayLiteral) -> None:
+        for element in expr.elements:
+            self.compile_node(element)
+        self.emit(OpCode.BUILD_ARRAY, len(expr.elements))
+
+    def visit_index_expr(self, expr: at.Index) -> None:
+        self.compile_node(expr.object)
+        self.compile_node(expr.index)
+        self.emit(OpCode.GET_INDEX, span=expr.span)
+
+    def visit_slice_expr(self, expr: at.Slice) -> None:
+        self.compile_node(expr.object)
+        for bound in (expr.start, expr.end):
+            if bound is None:
+                self.emit(OpCode.NIL)
+            else:
+                self.compile_node(bound)
+        self.emit(OpCode.SLICE, span=expr.span)
+
+    def visit_set_index_expr(self, expr: at.SetIndex) -> None:
+        self.compile_node(expr.object)
+        self.compile_node(expr.index)
+        self.compile_node(expr.value)
+        self.emit(OpCode.SET_INDEX, span=expr.span)
+
+    def visit_expression_stmnt(self, stmnt: at.Expression) -> None:
+        self.compile_node(stmnt.expression)
+        self.emit(OpCode.POP)
+
+    def visit_print_stmnt(self, stmnt: at.Print) -> None:
+        self.compile_node(stmnt.expression)
+        self.emit(OpCode.PRINT)
+
+    def visit_var_stmnt(self, stmnt: at.Var) -> None:
+        if stmnt.initializer is None:
+            self.emit(OpCode.NIL)
+        else:
+            self.compile_node(stmnt.initializer)
+        self.define(stmnt.name.value)
+
+    def visit_block_stmnt(self, stmnt: at.Block) -> None:
+        self.emit(OpCode.PUSH_SCOPE)
+        self.scope_depth += 1
+        for s in stmnt.statements:
+            self.compile_node(s)
+        self.scope_depth -= 1
+        self.emit(OpCode.POP_SCOPE)
+
+    def visit_if_stmnt(self, stmnt: at.If) -> None:
+        self.compile_node(stmnt.condition)
+        else_jump = self.emit_jump(OpCode.POP_JUMP_IF_FALSE)
+        self.compile_node(stmnt.then_branch)
+
+        if stmnt.else_branch is None:
+            self.patch_jump(else_jump)
+            return
+
+        end = self.emit_jump(OpCode.JUMP)
+        self.patch_jump(else_jump)
+        self.compile_node(stmnt.else_branch)
+        self.patch_jump(end)
+
+    def visit_while_stmnt(self, stmnt: at.While) -> None:
+        breaks: list[int] = []
+        calls: list[tuple[int, int]] = []
+        # pushed before the condition, whose calls can end the loop too
+        self.loops.append((self.scope_depth, breaks, calls))
+
+        start = len(self.chunk.code)
+        self.compile_node(stmnt.condition)
+        exit_jump = self.emit_jump(OpCode.POP_JUMP_IF_FALSE)
+        self.compile_node(stmnt.body)
+        self.loops.pop()
+
+        self.emit(OpCode.JUMP, start)
+        self.patch_jump(exit_jump)
+        for jump in breaks:
+            self.patch_jump(jump)
+        # a break in a called function that has no loop of its own ends this loop
+        for offset, depth in calls:
+            self.chunk.loop_exits[offset] = (len(self.chunk.code), depth - self.scope_depth)
+
+    def visit_break_stmnt(self, stmnt: at.Break) -> None:
+        if not self.loops:
+            self.emit(OpCode.BREAK_OUTSIDE_LOOP, span=stmnt.span)
+            return
+
+        depth, breaks, _ = self.loops[-1]
+        for _ in range(self.scope_depth - depth):
+            self.emit(OpCode.POP_SCOPE)
+        breaks.append(self.emit_jump(OpCode.JUMP))
+
+    def visit_return_stmnt(self, stmnt: at.Return) -> None:
+        if stmnt.value:
+            self.compile_node(stmnt.value)
+        else:
+            self.emit(OpCode.NIL)
+        self.emit(OpCode.RETURN)
+
+    def visit_function(self, stmnt: at.Function) -> None:
+        proto = self.compile_function(stmnt)
+        self.emit(OpCode.CLOSURE, self.chunk.add_constant(proto))
+        self.define(stmnt.name.value)
+
+    def visit_class_stmnt(self, stmnt: at.Class) -> None:
+        methods = tuple(self.compile_function(m, m.name.value == "init") for m in stmnt.methods)
+        static_methods = tuple(self.compile_function(m) for m in stmnt.static_methods)
+        proto = ClassProto(stmnt.name.value, methods, static_methods)
+        self.emit(OpCode.CLASS, self.chunk.add_constant(proto))
+        self.define(stmnt.name.value)
@@ -1,54 +1,59 @@
-from typing import Optional, Union, Any
+from typing import Optional, Any
 from nuterror import InterpreterError
-from utils import Span
+from utils import SpanId
 
 
 NutUnion = Any
 
 
 class Environment:
-    def __init__(self, enclosing: Optional["Environment"] = None) -> None:
-        self.enlosing_environment = enclosing
-        self.values: dict[str, Union[float, str, None]] = {}
+    """A local scope frame.
 
-    def get(self, name: str, span: Optional[Span] = None) -> NutUnion:
-        if name in self.values:
-            return self.values[name]
-        elif self.enlosing_environment is not None:
-            return self.enlosing_environment.get(name)
+    The resolver gives every local a slot in declaration order, so values are
+    kept in a plain list and addressed by ``(depth, slot)`` instead of by name.
+    """
+    __slots__ = ("enclosing", "values")
 
-        raise InterpreterError(f"Undefined variable '{name}'", span=span)
+    def __init__(self, enclosing: Optional["Environment"] = None, values: Optional[list] = None) -> None:
+        self.enclosing = enclosing
+        self.values: list[NutUnion] = [] if values is None else values
 
-    def is_variable_unique(self, name: str) -> bool:
-        if name in self.values:
-            return False
-        elif self.enlosing_environment is not None:
-            return self.enlosing_environment.is_variable_unique(name)
-        return True
-        
-    def set(self, name: str, value: NutUnion) -> None:
-        if name in self.values:
-            self.values[name] = value
-            return
-        if self.enlosing_environment is not None:
-            self.enlosing_environment.set(name, value)
-            return
-        raise InterpreterError(f"Undefined variable '{name}'")
-
-    def get_at(self, distance: int, name: str) -> NutUnion:
-        return self.ancestor(distance).get(name)
+    def get_at(self, distance: int, slot: int) -> NutUnion:
+        return self.ancestor(distance).values[slot]
 
-    def assign_at(self, distance: int, name: str, value: NutUnion) -> None:
-        self.ancestor(distance).set(name, value)
+    def assign_at(self, distance: int, slot: int, value: NutUnion) -> None:
+        self.ancestor(distance).values[slot] = value
 
     def ancestor(self, distance: int) -> "Environment":
         environment = self
-        
+
         for _ in range(distance):
-            environment = environment.enlosing_environment
+            environment = environment.enclosing
 
         return environment
 
-    def define(self, name: str, value: Union[float, str, None]) -> None:
-        self.values[name] = value
+    def define(self, value: NutUnion) -> None:
+        self.values.append(value)
+
+
+class GlobalEnvironment:
+    """The top-level scope. Globals are late bound, so they stay keyed by name."""
+    __slots__ = ("values",)
 
+    def __init__(self) -> None:
+        self.values: dict[str, NutUnion] = {}
+
+    def get(self, name: str, span: Optional[SpanId] = None) -> NutUnion:
+        if name in self.values:
+            return self.values[name]
+
+        raise InterpreterError(f"Undefined variable '{name}'", span=span)
+
+    def set(self, name: str, value: NutUnion, span: Optional[SpanId] = None) -> None:
+        if name in self.values:
+            self.values[name] = value
+            return
+        raise InterpreterError(f"Undefined variable '{name}'", span=span)
+
+    def define(self, name: str, value: NutUnion) -> None:
+        self.values[name] = value
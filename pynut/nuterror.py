@@ -1,21 +1,34 @@
+from enum import Enum
 from typing import Optional, Any
-from utils import Span
+from utils import SpanId
 
 
 class InterpreterError(BaseException):
-    def __init__(self, error: str, *args: object, span: Optional[Span] = None) -> None:
+    def __init__(self, error: str, *args: object, span: Optional[SpanId] = None) -> None:
         super().__init__(*args)
         self.error = error
         self.span = span
 
 class NutBreak(BaseException):
-    def __init__(self, span: Span):
+    def __init__(self, span: SpanId):
         self.span = span
 
 class NutReturn(BaseException):
-    def __init__(self, value: Any, span: Span):
+    def __init__(self, value: Any, span: SpanId):
         self.value = value
         self.span = span
+
+class Completion(Enum):
+    """How a statement ended when it did not just fall through to the next one.
+
+    The tree-walking and closure interpreters return these from execute
+    instead of raising NutBreak/NutReturn; the returned value itself is left
+    on the interpreter.
+    """
+    BREAK = 1
+    RETURN = 2
+    # `return f(...)`, the callee and arguments are left on the interpreter
+    TAIL_CALL = 3
         
 class ParserError(Exception):
     pass
@@ -1,7 +1,7 @@
-import string
-from nuttoken import Token, TokenType
-from utils import Span, Context
-from typing import Optional, Union
+import re
+from sys import intern
+from nuttoken import Token, TokenBuffer, TokenType
+from utils import Context
 
 keywords = {
     "and": TokenType.AND,
@@ -27,123 +27,110 @@ keywords = {
 
 
 
+# one alternative per kind of lexeme, tried in order at each position
+_LEXEME = re.compile(r"""
+    (?P<space>[ \t\r]+)
+  | (?P<newline>\n)
+  | (?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>[0-9]+(?:\.[0-9]+)?)
+  | (?P<comment>//[^\n]*)
+  | (?P<operator>[!=<>]=?|[(){}\[\]:,.\-+;*/])
+  | (?P<string>"[^"]*"?)
+  | (?P<error>.)
+""", re.VERBOSE)
+
+operators = {
+    "(": TokenType.LEFT_PAREN,
+    ")": TokenType.RIGHT_PAREN,
+    "{": TokenType.LEFT_BRACE,
+    "}": TokenType.RIGHT_BRACE,
+    "[": TokenType.LEFT_BRACKET,
+    "]": TokenType.RIGHT_BRACKET,
+    ":": TokenType.COLON,
+    ",": TokenType.COMMA,
+    ".": TokenType.DOT,
+    "-": TokenType.MINUS,
+    "+": TokenType.PLUS,
+    ";": TokenType.SEMICOLON,
+    "*": TokenType.STAR,
+    "/": TokenType.SLASH,
+    "!": TokenType.BANG,
+    "!=": TokenType.BANG_EQUAL,
+    "=": TokenType.EQUAL,
+    "==": TokenType.EQUAL_EQUAL,
+    "<": TokenType.LESS,
+    "<=": TokenType.LESS_EQUAL,
+    ">": TokenType.GREATER,
+    ">=": TokenType.GREATER_EQUAL,
+}
+
+
 class Lexer:
     def __init__(self, context: Context) -> None:
         self.source = context.source
-        self.tokens: list[Token] = []
         self.line = 1
-        self.start = 0
-        self.current = 0
         self.context = context
-        
-    def scan_tokens(self) -> None:
-        while(not self.is_at_end()):
-            self.start = self.current
-            self.scan_token()
-
-        self.tokens.append(Token(TokenType.EOF, "",Span(self.start, self.current, self.line)))
-        return self.tokens
-
-    def is_at_end(self) -> bool:
-        return self.current >= len(self.source)
-
-    def add_token(self, _type: TokenType, text: Optional[Union[str, float]] = None) -> None:        
-        text = text if text is not None else self.source[self.start:self.current]
-        self.tokens.append(Token(_type, text, Span(self.start, self.current, self.line)))
-
-    def advance(self) -> str:
-        self.current += 1
-        return self.source[self.current - 1]
-
-    def match(self, expected: str) -> bool:
-        if self.is_at_end() or self.source[self.current] != expected:
-            return False
-        
-        self.current += 1
-        return True
-
-    def peek(self) -> str:
-        return '' if self.is_at_end() else self.source[self.current]
-
-    def is_digit(self, c: str) -> bool:
-        return c >= '0' and c <= '9'
-
-    def string(self):
-        while self.peek() != '"' and not self.is_at_end():
-            if self.peek() == '\n':
-                self.line += 1
-            self.advance()
-
-        if self.is_at_end():
-            self.context.error(self.line, "Unterminated string")
-            return
-
-        self.advance()
-        self.add_token(TokenType.STRING, self.source[self.start + 1:self.current - 1])
-
-
-    def number(self):
-        while self.is_digit(self.peek()):
-            self.advance()
-
-        if self.peek() == '.' and self.is_digit(self.peek_next()):
-            self.advance()
-            while self.is_digit(self.peek()):
-                self.advance()
-
-        self.add_token(TokenType.NUMBER, float(self.source[self.start:self.current]))
-
-    def peek_next(self) -> str:
-        if(self.current + 1 > len(self.source)): return '/0'
-        return self.source[self.current + 1]
-
-    def is_alpha(self, c: str) -> bool:
-        return c == "_" or c in string.ascii_letters
-
-    def is_alpha_numeric(self, c: str) -> bool:
-        return self.is_alpha(c) or self.is_digit(c)
-
-    def identifier(self):
-        while (self.is_alpha_numeric(self.peek()) and not self.is_at_end()):
-            self.advance()
-            
-        self.add_token(keywords.get(self.source[self.start:self.current], TokenType.IDENTIFIER))
-
-    def scan_token(self) -> None:
-        c: str = self.advance()
-
-        match c:
-            case '(': self.add_token(TokenType.LEFT_PAREN)
-            case ')': self.add_token(TokenType.RIGHT_PAREN)
-            case '{': self.add_token(TokenType.LEFT_BRACE)
-            case '}': self.add_token(TokenType.RIGHT_BRACE)
-            case ',': self.add_token(TokenType.COMMA)
-            case '.': self.add_token(TokenType.DOT)
-            case '-': self.add_token(TokenType.MINUS)
-            case '+': self.add_token(TokenType.PLUS)
-            case ';': self.add_token(TokenType.SEMICOLON)
-            case '*': self.add_token(TokenType.STAR)
-            case '!': self.add_token(TokenType.BANG_EQUAL if  self.match('=') else TokenType.BANG)
-            case '=': self.add_token(TokenType.EQUAL_EQUAL if self.match('=') else TokenType.EQUAL)
-            case '<': self.add_token(TokenType.LESS_EQUAL if self.match('=') else TokenType.LESS)
-            case '>': self.add_token(TokenType.GREATER_EQUAL if self.match('=') else TokenType.GREATER)
-            case '/':
-                if self.match('/'):
-                    while (self.peek() != '\n' and not self.is_at_end()):
-                        self.advance()
-                else:
-                    self.add_token(TokenType.SLASH)
-
-            case (' '|'\r'|'\t'): pass
-            case '\n': self.line += 1
-
-            case '"': self.string()
-            case _:  
-                if self.is_digit(c):
-                    self.number()
-                elif self.is_alpha(c):
-                    self.identifier()
-                else:
-                    self.context.error_span(f"Unexpected character '{c}'", Span(self.start, self.current, self.line))
-            
 
+    def scan_tokens(self) -> list[Token]:
+        return list(self.tokenize())
+
+    def tokenize(self) -> TokenBuffer:
+        """All the tokens of the source, ending with EOF, in a compact TokenBuffer."""
+        source = self.source
+        buffer = TokenBuffer()
+        types, span_ids, value_ids = buffer.types.append, buffer.span_ids.append, buffer.value_ids.append
+        values, interned = buffer.values, buffer.interned
+        # token spans go straight into the context's table
+        spans = self.context.spans
+        span_starts = spans.starts
+        starts, ends, lines = span_starts.append, spans.ends.append, spans.lines.append
+        identifier, number, string = TokenType.IDENTIFIER, TokenType.NUMBER, TokenType.STRING
+        line = 1
+        # start of the last lexeme, the EOF token is reported there
+        start = 0
+
+        for m in _LEXEME.finditer(source):
+            kind = m.lastgroup
+            start = m.start()
+
+            if kind == "space":
+                continue
+            elif kind == "identifier":
+                value = m.group()
+                types(keywords.get(value, identifier))
+            elif kind == "operator":
+                value = m.group()
+                types(operators[value])
+            elif kind == "newline":
+                line += 1
+                continue
+            elif kind == "number":
+                value = float(m.group())
+                types(number)
+            elif kind == "string":
+                text = m.group()
+                line += text.count("\n")
+                if len(text) < 2 or text[-1] != '"':
+                    self.line = line
+                    self.context.error(line, "Unterminated string")
+                    continue
+                value = text[1:-1]
+                types(string)
+            elif kind == "error":
+                self.context.error_span(f"Unexpected character '{m.group()}'", spans.add(start, m.end(), line))
+                continue
+            else:
+                continue
+
+            span_ids(len(span_starts))
+            starts(start)
+            ends(m.end())
+            lines(line)
+            if (value_id := interned.get(value)) is None:
+                value_id = interned[value] = len(values)
+                values.append(intern(value) if type(value) is str else value)
+            value_ids(value_id)
+
+        self.line = line
+        buffer.append(TokenType.EOF, "", spans.add(start, len(source), line))
+        return buffer
@@ -0,0 +1,102 @@
+from typing import Any, Optional
+from nutarray import NutArray
+from nutclass import NutInstance
+from nuterror import InterpreterError
+from utils import SpanId
+
+
+class _BoolKey:
+    """Stands in for true and false as dict keys, which would otherwise collide with 1 and 0."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: bool) -> None:
+        self.value = value
+
+
+_TRUE, _FALSE = _BoolKey(True), _BoolKey(False)
+
+
+class NutMap:
+    """A hash map from numbers, strings, nil, booleans or instances to values.
+
+    Backed by a dict, so lookups are O(1) and iteration follows insertion
+    order. Instances are keyed by identity.
+    """
+    __slots__ = ("items",)
+
+    def __init__(self) -> None:
+        self.items: dict[Any, Any] = {}
+
+    @staticmethod
+    def key(key: Any) -> Any:
+        if type(key) is float or type(key) is str or key is None or isinstance(key, NutInstance):
+            return key
+        if type(key) is bool:
+            return _TRUE if key else _FALSE
+        raise TypeError("Map keys must be numbers, strings, nil, booleans or instances")
+
+    def get(self, key: Any, span: Optional[SpanId] = None) -> Any:
+        try:
+            return self.items[self.key(key)]
+        except KeyError:
+            raise InterpreterError(f"Undefined key '{key}'.", span=span) from None
+        except TypeError as e:
+            raise InterpreterError(str(e), span=span) from None
+
+    def set(self, key: Any, value: Any, span: Optional[SpanId] = None) -> None:
+        try:
+            self.items[self.key(key)] = value
+        except TypeError as e:
+            raise InterpreterError(str(e), span=span) from None
+
+    def keys(self) -> list:
+        return [k.value if type(k) is _BoolKey else k for k in self.items]
+
+    def __str__(self) -> str:
+        return "{" + ", ".join(f"{k}: {v}" for k, v in zip(self.keys(), self.items.values())) + "}"
+
+
+# values that take a[key] and a[key] = value
+INDEXABLE = (NutArray, NutMap)
+
+
+def _map(value: Any, function: str) -> NutMap:
+    if not isinstance(value, NutMap):
+        raise TypeError(f"{function} expects a map")
+    return value
+
+
+def _has(value: Any, key: Any) -> bool:
+    return NutMap.key(key) in _map(value, "has").items
+
+
+def _delete(value: Any, key: Any) -> bool:
+    """Removes key, true if it was there."""
+    items, key = _map(value, "delete").items, NutMap.key(key)
+    if key not in items:
+        return False
+    del items[key]
+    return True
+
+
+def _size(value: Any) -> float:
+    return float(len(_map(value, "size").items))
+
+
+def _keys(value: Any) -> NutArray:
+    return NutArray.of(_map(value, "keys").keys())
+
+
+def _values(value: Any) -> NutArray:
+    return NutArray.of(list(_map(value, "values").items.values()))
+
+
+# name -> (arity, function, pure), defined as globals by every engine
+NATIVES = {
+    "Map": (0, NutMap, False),
+    "has": (2, _has, False),
+    "delete": (2, _delete, False),
+    "size": (1, _size, False),
+    "keys": (1, _keys, False),
+    "values": (1, _values, False),
+}
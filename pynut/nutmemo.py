@@ -0,0 +1,248 @@
+import math
+from collections import OrderedDict
+from typing import Any, Optional
+from nutvisitor import ExprVisitor, StmntVisitor
+from nutcallable import NutNativeCallable
+import nutast as at
+
+
+class Memo:
+    """A bounded LRU cache of a pure function's results, keyed on its arguments."""
+    __slots__ = ("name", "size", "results", "hits", "misses")
+
+    def __init__(self, name: str, size: int) -> None:
+        self.name = name
+        self.size = size
+        self.results: OrderedDict[tuple, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(arguments: list) -> Optional[tuple]:
+        # only plain values can be keys, booleans would collide with 1.0 and 0.0
+        for arg in arguments:
+            if type(arg) is float:
+                if arg == 0.0 and math.copysign(1.0, arg) < 0:
+                    return None
+            elif type(arg) is not str and arg is not None:
+                return None
+        return tuple(arguments)
+
+    def lookup(self, key: tuple) -> tuple[bool, Any]:
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return True, self.results[key]
+        self.misses += 1
+        return False, None
+
+    def store(self, key: tuple, value: Any) -> None:
+        self.results[key] = value
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+    def __str__(self) -> str:
+        return f"{self.name}: {self.hits} hits, {self.misses} misses, {len(self.results)} cached"
+
+
+class PurityAnalyzer(ExprVisitor, StmntVisitor):
+    """Marks top-level functions whose result only depends on their arguments.
+
+    Runs on a resolved program. A function is pure when its body has no
+    print, property access, 'this', nested function or class, and only
+    assigns its own locals. Any global it reads must be a pure native or a
+    function declared once with `fun` and never assigned, and every function
+    it calls must be pure as well; mutual recursion is settled by dropping
+    impure functions until nothing changes.
+    """
+
+    def __init__(self, interpreter) -> None:
+        self.interpreter = interpreter
+        # per candidate: the global functions it depends on, None once found impure
+        self.uses: Optional[set[str]] = None
+        self.scope_depth = 0
+        self.candidates: set[str] = set()
+        self.natives: set[str] = set()
+        self.assigned: set[str] = set()
+
+    def analyze(self, statements: list[at.Stmnt]) -> list[at.Function]:
+        """Sets Function.pure on the pure functions and returns them."""
+        declared: dict[str, int] = {}
+        for stmnt in statements:
+            if isinstance(stmnt, (at.Var, at.Function, at.Class)):
+                declared[stmnt.name.value] = declared.get(stmnt.name.value, 0) + 1
+
+        functions = {s.name.value: s for s in statements if isinstance(s, at.Function)}
+        self.candidates = {name for name in functions if declared[name] == 1}
+        self.natives = {name for name, value in self.interpreter.globals.values.items()
+                        if isinstance(value, NutNativeCallable) and value.pure and name not in declared}
+        self.assigned = set()
+
+        deps: dict[str, set[str]] = {}
+        for name in self.candidates:
+            self.uses = set()
+            self.scope_depth = 1
+            self.statements(functions[name].body)
+            if self.uses is not None:
+                deps[name] = self.uses
+
+        # assignments anywhere, including top-level code, rule a function out
+        for stmnt in statements:
+            if not isinstance(stmnt, at.Function):
+                self.uses, self.scope_depth = set(), 0
+                stmnt.accept(self)
+
+        pure = {name for name in (*deps, *self.natives) if name not in self.assigned}
+        changed = True
+        while changed:
+            changed = False
+            for name in list(pure):
+                if name in deps and not deps[name] <= pure:
+                    pure.discard(name)
+                    changed = True
+
+        pure_functions = [function for name, function in functions.items() if name in deps and name in pure]
+        for function in pure_functions:
+            function.pure = True
+        return pure_functions
+
+    def impure(self) -> None:
+        self.uses = None
+
+    def statements(self, statements: list[at.Stmnt]) -> None:
+        for stmnt in statements:
+            stmnt.accept(self)
+
+    def expr(self, expr: at.Expr) -> None:
+        expr.accept(self)
+
+    def read_global(self, name: str) -> None:
+        if name not in self.candidates and name not in self.natives:
+            self.impure()
+        elif self.uses is not None:
+            self.uses.add(name)
+
+    # -- expressions ------------------------------------------------------------
+
+    def visit_literal_expr(self, expr: at.Literal) -> None:
+        pass
+
+    def visit_grouping_expr(self, expr: at.Grouping) -> None:
+        self.expr(expr.expression)
+
+    def visit_variable_expr(self, expr: at.Variable) -> None:
+        if expr.depth is None:
+            self.read_global(expr.name.value)
+        elif expr.depth >= self.scope_depth:
+            # captured from an enclosing function, which may change it
+            self.impure()
+
+    def visit_assign_expr(self, expr: at.Assign) -> None:
+        self.expr(expr.value)
+        if expr.depth is None:
+            self.assigned.add(expr.name.value)
+            self.impure()
+        elif expr.depth >= self.scope_depth:
+            self.impure()
+
+    def visit_unary_expr(self, expr: at.Unary) -> None:
+        self.expr(expr.right)
+
+    def visit_binary_expr(self, expr: at.Binary) -> None:
+        self.expr(expr.left)
+        self.expr(expr.right)
+
+    def visit_logical_expr(self, expr: at.Logical) -> None:
+        self.expr(expr.left)
+        self.expr(expr.right)
+
+    def visit_call_expr(self, expr: at.Call) -> None:
+        # only calls to named globals can be checked, anything else could be impure
+        if not (isinstance(expr.callee, at.Variable) and expr.callee.depth is None):
+            self.impure()
+        self.expr(expr.callee)
+        for arg in expr.arguments:
+            self.expr(arg)
+
+    def visit_get_expr(self, expr: at.Get) -> None:
+        self.impure()
+        self.expr(expr.object)
+
+    def visit_set_expr(self, expr: at.Set) -> None:
+        self.impure()
+        self.expr(expr.object)
+        self.expr(expr.value)
+
+    # arrays are mutable, a result computed from one could go stale
+    def visit_array_expr(self, expr: at.ArrayLiteral) -> None:
+        self.impure()
+        for element in expr.elements:
+            self.expr(element)
+
+    def visit_index_expr(self, expr: at.Index) -> None:
+        self.impure()
+        self.expr(expr.object)
+        self.expr(expr.index)
+
+    def visit_slice_expr(self, expr: at.Slice) -> None:
+        self.impure()
+        self.expr(expr.object)
+        for bound in (expr.start, expr.end):
+            if bound is not None:
+                self.expr(bound)
+
+    def visit_set_index_expr(self, expr: at.SetIndex) -> None:
+        self.impure()
+        self.expr(expr.object)
+        self.expr(expr.index)
+        self.expr(expr.value)
+
+    def visit_this_expr(self, expr: at.This) -> None:
+        self.impure()
+
+    # -- statements -------------------------------------------------------------
+
+    def visit_expression_stmnt(self, stmnt: at.Expression) -> None:
+        self.expr(stmnt.expression)
+
+    def visit_print_stmnt(self, stmnt: at.Print) -> None:
+        self.impure()
+        self.expr(stmnt.expression)
+
+    def visit_var_stmnt(self, stmnt: at.Var) -> None:
+        if stmnt.initializer is not None:
+            self.expr(stmnt.initializer)
+
+    def visit_block_stmnt(self, stmnt: at.Block) -> None:
+        self.scope_depth += 1
+        self.statements(stmnt.statements)
+        self.scope_depth -= 1
+
+    def visit_if_stmnt(self, stmnt: at.If) -> None:
+        self.expr(stmnt.condition)
+        stmnt.then_branch.accept(self)
+        if stmnt.else_branch is not None:
+            stmnt.else_branch.accept(self)
+
+    def visit_while_stmnt(self, stmnt: at.While) -> None:
+        self.expr(stmnt.condition)
+        stmnt.body.accept(self)
+
+    def visit_break_stmnt(self, stmnt: at.Break) -> None:
+        pass
+
+    def visit_return_stmnt(self, stmnt: at.Return) -> None:
+        if stmnt.value is not None:
+            self.expr(stmnt.value)
+
+    def visit_function(self, stmnt: at.Function) -> None:
+        # a new closure per call could be told apart from a cached one
+        self.impure()
+        depth, self.scope_depth = self.scope_depth, 1
+        self.statements(stmnt.body)
+        self.scope_depth = depth
+
+    def visit_class_stmnt(self, stmnt: at.Class) -> None:
+        self.impure()
+        for method in stmnt.methods + stmnt.static_methods:
+            self.visit_function(method)
@@ -0,0 +1,288 @@
+from typing import Any, Optional
+from nutvisitor import ExprVisitor, StmntVisitor
+from nuttoken import TokenType
+from utils import Context
+import nutast as at
+
+
+_FOLDABLE = {
+    TokenType.MINUS: lambda a, b: a - b,
+    TokenType.STAR: lambda a, b: a * b,
+    TokenType.SLASH: lambda a, b: a / b,
+    TokenType.GREATER: lambda a, b: a > b,
+    TokenType.GREATER_EQUAL: lambda a, b: a >= b,
+    TokenType.LESS: lambda a, b: a < b,
+    TokenType.LESS_EQUAL: lambda a, b: a <= b,
+}
+
+
+class Constant:
+    __slots__ = ("assigned", "value")
+
+    def __init__(self) -> None:
+        self.assigned = False
+        # the literal the variable was declared with, if it is never reassigned
+        self.value: Optional[at.Literal] = None
+
+
+class Optimizer(ExprVisitor, StmntVisitor):
+    """Folds constant expressions and drops dead branches before resolution.
+
+    Runs over the program twice. The first pass folds what it can and records
+    which locals are ever assigned; the second pass also replaces reads of
+    locals that were declared with a literal and never reassigned. Globals are
+    left alone since they can be redefined or read before their declaration.
+
+    Only operations that cannot fail are folded, so runtime errors are still
+    reported by the interpreter at the same place.
+    """
+
+    def __init__(self, verbose: bool = False, context: Optional[Context] = None) -> None:
+        self.verbose = verbose
+        # only needed to give the line of what was changed
+        self.context = context
+        self.report: list[str] = []
+        self.constants: dict[int, Constant] = {}
+        self.scopes: list[dict[str, Constant]] = []
+        self.propagate = False
+
+    def optimize(self, statements: list[at.Stmnt]) -> list[at.Stmnt]:
+        statements = self.statements(statements)
+        self.propagate = True
+        statements = self.statements(statements)
+
+        if self.verbose:
+            for line in self.report:
+                print(f"optimizer: {line}")
+        return statements
+
+    def note(self, node: at.Node, message: str) -> None:
+        where = f"line {self.context.spans.lines[node.span]}: " if node.span is not None and self.context else ""
+        self.report.append(f"{where}{message}")
+
+    def fold(self, expr: at.Expr, value: Any) -> at.Literal:
+        literal = at.Literal(expr.span, value)
+        self.note(expr, f"folded {expr} -> {literal}")
+        return literal
+
+    def statements(self, statements: list[at.Stmnt]) -> list[at.Stmnt]:
+        return [s for s in (self.statement(s) for s in statements) if s is not None]
+
+    def statement(self, stmnt: at.Stmnt) -> Optional[at.Stmnt]:
+        return stmnt.accept(self)
+
+    def branch(self, stmnt: at.Stmnt) -> at.Stmnt:
+        # a statement that must stay syntactically present, such as a loop body
+        result = self.statement(stmnt)
+        return result if result is not None else at.Block(stmnt.span, [])
+
+    def expr(self, expr: at.Expr) -> at.Expr:
+        return expr.accept(self)
+
+    # -- scopes -----------------------------------------------------------------
+
+    def begin_scope(self) -> None:
+        self.scopes.append({})
+
+    def end_scope(self) -> None:
+        self.scopes.pop()
+
+    def declare(self, key: object, name: str) -> Constant:
+        constant = self.constants.setdefault(id(key), Constant())
+        if self.scopes:
+            self.scopes[-1][name] = constant
+        return constant
+
+    def lookup(self, name: str) -> Optional[Constant]:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    # -- expressions ------------------------------------------------------------
+
+    def visit_literal_expr(self, expr: at.Literal) -> at.Expr:
+        return expr
+
+    def visit_grouping_expr(self, expr: at.Grouping) -> at.Expr:
+        expr.expression = self.expr(expr.expression)
+        if isinstance(expr.expression, at.Literal):
+            return expr.expression
+        return expr
+
+    def visit_variable_expr(self, expr: at.Variable) -> at.Expr:
+        constant = self.lookup(expr.name.value)
+        if self.propagate and constant is not None and constant.value is not None:
+            literal = at.Literal(expr.span, constant.value.value)
+            self.note(expr, f"propagated {expr.name.value} -> {literal}")
+            return literal
+        return expr
+
+    def visit_assign_expr(self, expr: at.Assign) -> at.Expr:
+        expr.value = self.expr(expr.value)
+        if (constant := self.lookup(expr.name.value)) is not None:
+            constant.assigned = True
+        return expr
+
+    def visit_unary_expr(self, expr: at.Unary) -> at.Expr:
+        expr.right = self.expr(expr.right)
+        right = expr.right
+
+        if isinstance(right, at.Literal):
+            if expr.operator.type is TokenType.BANG:
+                return self.fold(expr, not right.value)
+            if isinstance(right.value, float):
+                return self.fold(expr, -right.value)
+        return expr
+
+    def visit_binary_expr(self, expr: at.Binary) -> at.Expr:
+        expr.left = self.expr(expr.left)
+        expr.right = self.expr(expr.right)
+        left, right = expr.left, expr.right
+
+        if not (isinstance(left, at.Literal) and isinstance(right, at.Literal)):
+            return expr
+
+        l, r = left.value, right.value
+        t = expr.operator.type
+
+        if t is TokenType.EQUAL_EQUAL:
+            return self.fold(expr, l == r)
+        if t is TokenType.BANG_EQUAL:
+            return self.fold(expr, l != r)
+        if t is TokenType.PLUS and type(l) is type(r) and type(l) in (float, str):
+            return self.fold(expr, l + r)
+        if t in _FOLDABLE and type(l) is float and type(r) is float and not (t is TokenType.SLASH and r == 0):
+            return self.fold(expr, _FOLDABLE[t](l, r))
+        return expr
+
+    def visit_logical_expr(self, expr: at.Logical) -> at.Expr:
+        expr.left = self.expr(expr.left)
+        expr.right = self.expr(expr.right)
+
+        if not isinstance(expr.left, at.Literal):
+            return expr
+
+        taken = bool(expr.left.value) == (expr.operator.type is TokenType.OR)
+        result = expr.left if taken else expr.right
+        self.note(expr, f"folded {expr} -> {result}")
+        return result
+
+    def visit_call_expr(self, expr: at.Call) -> at.Expr:
+        expr.callee = self.expr(expr.callee)
+        expr.arguments = [self.expr(arg) for arg in expr.arguments]
+        return expr
+
+    def visit_get_expr(self, expr: at.Get) -> at.Expr:
+        expr.object = self.expr(expr.object)
+        return expr
+
+    def visit_set_expr(self, expr: at.Set) -> at.Expr:
+        expr.object = self.expr(expr.object)
+        expr.value = self.expr(expr.value)
+        return expr
+
+    def visit_array_expr(self, expr: at.ArrayLiteral) -> at.Expr:
+        expr.elements = [self.expr(element) for element in expr.elements]
+        return expr
+
+    def visit_index_expr(self, expr: at.Index) -> at.Expr:
+        expr.object = self.expr(expr.object)
+        expr.index = self.expr(expr.index)
+        return expr
+
+    def visit_slice_expr(self, expr: at.Slice) -> at.Expr:
+        expr.object = self.expr(expr.object)
+        expr.start = None if expr.start is None else self.expr(expr.start)
+        expr.end = None if expr.end is None else self.expr(expr.end)
+        return expr
+
+    def visit_set_index_expr(self, expr: at.SetIndex) -> at.Expr:
+        expr.object = self.expr(expr.object)
+        expr.index = self.expr(expr.index)
+        expr.value = self.expr(expr.value)
+        return expr
+
+    def visit_this_expr(self, expr: at.This) -> at.Expr:
+        return expr
+
+    # -- statements -------------------------------------------------------------
+
+    def visit_expression_stmnt(self, stmnt: at.Expression) -> at.Stmnt:
+        stmnt.expression = self.expr(stmnt.expression)
+        return stmnt
+
+    def visit_print_stmnt(self, stmnt: at.Print) -> at.Stmnt:
+        stmnt.expression = self.expr(stmnt.expression)
+        return stmnt
+
+    def visit_var_stmnt(self, stmnt: at.Var) -> at.Stmnt:
+        if stmnt.initializer is not None:
+            stmnt.initializer = self.expr(stmnt.initializer)
+
+        constant = self.declare(stmnt.name, stmnt.name.value)
+        literal = self.scopes and not constant.assigned and isinstance(stmnt.initializer, at.Literal)
+        constant.value = stmnt.initializer if literal else None
+        return stmnt
+
+    def visit_block_stmnt(self, stmnt: at.Block) -> at.Stmnt:
+        self.begin_scope()
+        stmnt.statements = self.statements(stmnt.statements)
+        self.end_scope()
+        return stmnt
+
+    def visit_if_stmnt(self, stmnt: at.If) -> Optional[at.Stmnt]:
+        stmnt.condition = self.expr(stmnt.condition)
+
+        if isinstance(stmnt.condition, at.Literal):
+            taken = stmnt.then_branch if stmnt.condition.value else stmnt.else_branch
+            kept = "then branch" if stmnt.condition.value else "else branch" if taken is not None else "nothing"
+            self.note(stmnt, f"if ({stmnt.condition}) reduced to its {kept}")
+            return self.statement(taken) if taken is not None else None
+
+        stmnt.then_branch = self.branch(stmnt.then_branch)
+        if stmnt.else_branch is not None:
+            stmnt.else_branch = self.statement(stmnt.else_branch)
+        return stmnt
+
+    def visit_while_stmnt(self, stmnt: at.While) -> Optional[at.Stmnt]:
+        stmnt.condition = self.expr(stmnt.condition)
+
+        if isinstance(stmnt.condition, at.Literal) and not stmnt.condition.value:
+            self.note(stmnt, f"removed while ({stmnt.condition}) loop that never runs")
+            return None
+
+        stmnt.body = self.branch(stmnt.body)
+        return stmnt
+
+    def visit_break_stmnt(self, stmnt: at.Break) -> at.Stmnt:
+        return stmnt
+
+    def visit_return_stmnt(self, stmnt: at.Return) -> at.Stmnt:
+        if stmnt.value is not None:
+            stmnt.value = self.expr(stmnt.value)
+        return stmnt
+
+    def function(self, stmnt: at.Function) -> None:
+        self.begin_scope()
+        for param in stmnt.params:
+            self.declare(param, param.value).assigned = True
+        stmnt.body = self.statements(stmnt.body)
+        self.end_scope()
+
+    def visit_function(self, stmnt: at.Function) -> at.Stmnt:
+        self.declare(stmnt.name, stmnt.name.value)
+        self.function(stmnt)
+        return stmnt
+
+    def visit_class_stmnt(self, stmnt: at.Class) -> at.Stmnt:
+        self.declare(stmnt.name, stmnt.name.value)
+
+        for method in stmnt.static_methods:
+            self.function(method)
+
+        self.begin_scope()
+        for method in stmnt.methods:
+            self.function(method)
+        self.end_scope()
+        return stmnt
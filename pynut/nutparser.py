@@ -1,16 +1,18 @@
-from nuttoken import TokenType, Token
+from nuttoken import TokenBuffer, TokenType, Token
 import nutast as at
-from utils import Context, Span
-from typing import Union
+from utils import Context, SpanId
+from typing import Iterable, Optional, Union
 from nuterror import ParserError
 
 
 
 
 class Parser:
-    def __init__(self, tokens: list[Token], context: Context) -> None:
-        self.tokens = tokens
-        self.current = 0
+    def __init__(self, tokens: Union[TokenBuffer, Iterable[Token]], context: Context) -> None:
+        self.tokens = tokens if isinstance(tokens, TokenBuffer) else TokenBuffer.from_tokens(tokens)
+        # the parser looks at token types by index, Tokens are made for the AST and errors only
+        self.types = self.tokens.types
+        self.pos = 0
 
         self.context = context
 
@@ -111,9 +113,9 @@ class Parser:
             return self.while_statement()
         if self.match(TokenType.BREAK):
             self.consume(TokenType.SEMICOLON, "Expected ';' after 'break'")
-            return at.Break(self.previous().span)
+            return at.Break(self.tokens.span(self.pos - 1))
         if self.match(TokenType.LEFT_BRACE):
-            return at.Block(self.previous().span, self.block())
+            return at.Block(self.tokens.span(self.pos - 1), self.block())
         
         return self.expression_statement()
 
@@ -121,9 +123,7 @@ class Parser:
         keyword = self.previous()
         value = None if self.check(TokenType.SEMICOLON) else self.expression()
         self.consume(TokenType.SEMICOLON, "Expected ';' after return value")
-        span = keyword.span
-        if value:
-            span.end = value.span.end
+        span = self.span_from(keyword, value) if value else keyword.span
 
         return at.Return(span, keyword, value)
 
@@ -153,7 +153,8 @@ class Parser:
         if condition is None:
             condition = at.Literal(None, True)
 
-        body = at.While(None, condition, body)
+        # the condition's line, so the loop has a place to report from
+        body = at.While(condition.span, condition, body)
 
         if initializer is not None:
             body = at.Block(None, [initializer, body])
@@ -191,31 +192,32 @@ class Parser:
     def Expr(self) -> at.Expr:
         return self.equality()
 
-    def span_from(self, first: Union[at.Node, Token], last: Union[at.Node, Token]) -> Span:
-        return Span(first.span.start, last.span.end, first.span.line)
+    def span_from(self, first: Union[at.Node, Token], last: Union[at.Node, Token]) -> SpanId:
+        return self.context.spans.join(first.span, last.span)
 
     def match(self, *token_types: TokenType) -> bool:
-        for tt in token_types:
-            if self.check(tt):
-                self.advance()
-                return True
+        # EOF is never asked for, so the cursor cannot move past it
+        if self.types[self.pos] in token_types:
+            self.pos += 1
+            return True
         return False
 
     def check(self, t_type: TokenType) -> bool:
-        return False if self.is_at_end() else self.peek().type == t_type
+        return self.types[self.pos] == t_type
 
     def advance(self) -> Token:
-        if (not self.is_at_end()): self.current += 1
+        if (not self.is_at_end()):
+            self.pos += 1
         return self.previous()
 
     def is_at_end(self) -> bool:
-        return self.peek().type == TokenType.EOF
+        return self.types[self.pos] == TokenType.EOF
 
     def peek(self) -> Token:
-        return self.tokens[self.current]
+        return self.tokens.token(self.pos)
 
-    def previous(self) -> Token:
-        return self.tokens[self.current - 1]
+    def previous(self) -> Optional[Token]:
+        return self.tokens.token(self.pos - 1) if self.pos else None
 
     def expression(self) -> at.Expr:
         return self.assignment()
@@ -244,7 +246,6 @@ class Parser:
         expr =  self._or()
 
         if (self.match(TokenType.EQUAL)):
-            equals = self.previous()
             value = self.assignment()
 
             if (isinstance(expr, at.Variable)):
@@ -252,6 +253,8 @@ class Parser:
                 return at.Assign(expr.span, t_name, value)
             elif (isinstance(expr, at.Get)):
                 return at.Set(expr.span, expr.object, expr.name, value)
+            elif (isinstance(expr, at.Index)):
+                return at.SetIndex(expr.span, expr.object, expr.index, value)
 
             raise self.error("Invalid assignment target")
         return expr
@@ -313,10 +316,23 @@ class Parser:
             elif self.match(TokenType.DOT):
                 name = self.consume(TokenType.IDENTIFIER, "Expected property name after '.'")
                 expr = at.Get(self.span_from(expr, name), expr, name)
+            elif self.match(TokenType.LEFT_BRACKET):
+                expr = self.finish_index(expr)
             else:
                 break
         return expr
 
+    def finish_index(self, obj: at.Expr) -> at.Expr:
+        start = None if self.check(TokenType.COLON) else self.expression()
+
+        if self.match(TokenType.COLON):
+            end = None if self.check(TokenType.RIGHT_BRACKET) else self.expression()
+            bracket = self.consume(TokenType.RIGHT_BRACKET, "Expected ']' after slice")
+            return at.Slice(self.span_from(obj, bracket), obj, start, end)
+
+        bracket = self.consume(TokenType.RIGHT_BRACKET, "Expected ']' after index")
+        return at.Index(self.span_from(obj, bracket), obj, start)
+
     def finish_call(self, callee: at.Expr) -> at.Expr:
         #TODO: reimplement this function
         arguments = []
@@ -344,37 +360,58 @@ class Parser:
 
     def primary(self) -> at.Expr:
         if self.match(TokenType.IDENTIFIER):
-            return at.Variable(self.previous().span, self.previous())
+            name = self.previous()
+            return at.Variable(name.span, name)
                 
         if self.match(TokenType.FALSE):
-            return at.Literal(self.previous().span, False)
+            return at.Literal(self.tokens.span(self.pos - 1), False)
 
         if self.match(TokenType.TRUE):
-            return at.Literal(self.previous().span, True)
+            return at.Literal(self.tokens.span(self.pos - 1), True)
         
         if self.match(TokenType.NIL): 
-            return at.Literal(self.previous().span, None)
+            return at.Literal(self.tokens.span(self.pos - 1), None)
 
         if self.match(TokenType.NUMBER, TokenType.STRING):
-            return at.Literal(self.previous().span, self.previous().value)
+            literal = self.previous()
+            return at.Literal(literal.span, literal.value)
 
         if self.match(TokenType.THIS):
-            return at.This(self.previous().span, self.previous())
+            keyword = self.previous()
+            return at.This(keyword.span, keyword)
 
         if self.match(TokenType.LEFT_PAREN):
             expr = self.expression()
             self.consume(TokenType.RIGHT_PAREN, "Expected ')' after expression")
             return at.Grouping(expr.span, expr)
 
+        if self.match(TokenType.LEFT_BRACKET):
+            return self.array_literal()
+
         raise self.error("Expected expression")
 
+    def array_literal(self) -> at.Expr:
+        bracket = self.previous()
+        elements = []
+
+        if not self.check(TokenType.RIGHT_BRACKET):
+            while True:
+                elements.append(self.expression())
+                if not self.match(TokenType.COMMA):
+                    break
+
+        end = self.consume(TokenType.RIGHT_BRACKET, "Expected ']' after array elements")
+        return at.ArrayLiteral(self.span_from(bracket, end), elements)
+
     def consume(self, type: TokenType, message: str):
         if self.check(type): return self.advance()
 
         raise self.error(message)
 
     def error(self, message: str):
-        self.context.error_span(f"syntax error: {message}", self.previous().span)
+        # nothing consumed yet, point at the offending first token
+        token = self.previous() or self.peek()
+        self.context.error_span(f"syntax error: {message}", token.span)
         return ParserError()
 
 
@@ -384,7 +421,7 @@ class Parser:
 
         while (not self.is_at_end()):
             
-            if self.peek().type in  (TokenType.CLASS, TokenType.FUN, TokenType.VAR, TokenType.FOR, TokenType.IF, TokenType.WHILE, TokenType.PRINT, TokenType.RETURN, TokenType.STATIC):
+            if self.types[self.pos] in  (TokenType.CLASS, TokenType.FUN, TokenType.VAR, TokenType.FOR, TokenType.IF, TokenType.WHILE, TokenType.PRINT, TokenType.RETURN, TokenType.STATIC):
                 return
             
             self.advance()
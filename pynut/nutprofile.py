@@ -0,0 +1,163 @@
+import marshal
+from time import perf_counter
+from typing import Any, Callable, Optional
+from utils import Context, SpanTable
+from nutastinterpreter import Interpreter
+from nutcallable import NutBoundMethod, NutCallable, NutFunction, NutNativeCallable
+from nutclass import NutClass
+from nuterror import Completion
+import nutast as at
+
+# (file, line, name), how pstats identifies a function
+FunctionKey = tuple[str, int, str]
+
+
+class FunctionStats:
+    __slots__ = ("calls", "primitive", "own", "total", "callers")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        # calls made while the function was not already running, pstats' primitive calls
+        self.primitive = 0
+        # seconds excluding and including the functions it called
+        self.own = 0.0
+        self.total = 0.0
+        # caller -> [calls, primitive, own, total] of the calls coming from it,
+        # the (nc, cc, tt, ct) order pstats keeps caller edges in
+        self.callers: dict[FunctionKey, list] = {}
+
+
+class Profiler:
+    """Call counts, exclusive and inclusive wall time, and caller edges per function.
+
+    Like cProfile, a recursive call adds to a function's call count and own
+    time but only the outermost call adds to its total. The whole program is
+    recorded as a call to '<module>' so top-level calls have a caller.
+    """
+
+    def __init__(self, file_name: str, natives: dict[int, str], spans: SpanTable) -> None:
+        self.file_name = file_name
+        # the program's spans, for the line each function is defined on
+        self.lines = spans.lines
+        # id of each builtin -> the global name it is bound to
+        self.natives = natives
+        self.stats: dict[FunctionKey, FunctionStats] = {}
+        # [key, seconds spent in callees, start] of every call in progress
+        self.stack: list[list] = []
+        self.running: dict[FunctionKey, int] = {}
+
+    def key(self, callee: NutCallable) -> FunctionKey:
+        if isinstance(callee, NutBoundMethod):
+            callee = callee.method
+        if isinstance(callee, NutFunction):
+            return self.file_name, self.lines[callee.callable.span], callee.callable.name.value
+        if isinstance(callee, NutClass):
+            init = callee.find_method("init")
+            return self.file_name, self.lines[init.callable.span] if init is not None else 0, callee.name
+        if isinstance(callee, NutNativeCallable):
+            return "~", 0, f"<built-in {self.natives.get(id(callee), callee.callable.__name__)}>"
+        return "~", 0, str(callee)
+
+    def enter(self, key: FunctionKey) -> None:
+        self.running[key] = self.running.get(key, 0) + 1
+        self.stack.append([key, 0.0, perf_counter()])
+
+    def exit(self) -> None:
+        now = perf_counter()
+        key, callees, start = self.stack.pop()
+        elapsed = now - start
+        own = elapsed - callees
+        outermost = self.running[key] == 1
+        self.running[key] -= 1
+
+        if (stats := self.stats.get(key)) is None:
+            stats = self.stats[key] = FunctionStats()
+        stats.calls += 1
+        stats.own += own
+        if outermost:
+            stats.primitive += 1
+            stats.total += elapsed
+
+        if self.stack:
+            caller = self.stack[-1]
+            caller[1] += elapsed
+            if (edge := stats.callers.get(caller[0])) is None:
+                edge = stats.callers[caller[0]] = [0, 0, 0.0, 0.0]
+            edge[0] += 1
+            edge[1] += outermost
+            edge[2] += own
+            if outermost:
+                edge[3] += elapsed
+
+    def measure(self, key: FunctionKey, function: Callable, *args: Any) -> Any:
+        self.enter(key)
+        try:
+            return function(*args)
+        finally:
+            self.exit()
+
+    def tail_call(self, key: FunctionKey) -> None:
+        """The running function hands its frame to key, which returns to the same caller."""
+        self.exit()
+        self.enter(key)
+
+    def dump(self, path: str) -> None:
+        """Writes the stats in the marshal format pstats.Stats reads."""
+        stats = {key: (s.primitive, s.calls, s.own, s.total, {caller: tuple(edge) for caller, edge in s.callers.items()})
+                 for key, s in self.stats.items()}
+        with open(path, "wb") as f:
+            marshal.dump(stats, f)
+
+    @staticmethod
+    def label(key: FunctionKey) -> str:
+        file_name, line, name = key
+        return name if file_name == "~" else f"{name} ({file_name}:{line})"
+
+    def report(self, limit: int = 20) -> None:
+        calls = sum(s.calls for s in self.stats.values())
+        elapsed = max((s.total for s in self.stats.values()), default=0.0)
+        print(f"profile: {calls} calls in {elapsed:.3f} s, sorted by own time")
+        print(f"{'calls':>12} {'own s':>9} {'total s':>9} {'own/call ms':>12}  function")
+        for key, s in sorted(self.stats.items(), key=lambda item: item[1].own, reverse=True)[:limit]:
+            count = str(s.calls) if s.calls == s.primitive else f"{s.calls}/{s.primitive}"
+            print(f"{count:>12} {s.own:9.3f} {s.total:9.3f} {s.own / s.calls * 1000:12.4f}  {self.label(key)}")
+
+        edges = [(caller, key, edge) for key, s in self.stats.items() for caller, edge in s.callers.items()]
+        if edges:
+            print(f"\n{'calls':>12} {'total s':>9}  caller -> callee")
+            for caller, key, edge in sorted(edges, key=lambda e: e[2][3], reverse=True)[:limit]:
+                print(f"{edge[0]:>12} {edge[3]:9.3f}  {self.label(caller)} -> {self.label(key)}")
+
+
+class ProfilingInterpreter(Interpreter):
+    """The tree-walking interpreter with every call timed by a Profiler.
+
+    Tail calls still reuse their caller's frame, the profiler closes the
+    returning function there and charges the rest to the one it called.
+    """
+
+    def __init__(self, context: Optional[Context]):
+        super().__init__(context)
+        natives = {id(value): name for name, value in self.globals.values.items()
+                   if isinstance(value, NutNativeCallable)}
+        self.profiler = Profiler(context.file_name if context else "<stdin>", natives,
+                                 context.spans if context else SpanTable())
+
+    def interpret(self, statements: list[at.Stmnt]) -> None:
+        self.profiler.measure((self.profiler.file_name, 0, "<module>"), super().interpret, statements)
+
+    def visit_call_expr(self, expr: at.Call) -> Any:
+        callee, args = self.prepare_call(expr)
+        # inline rather than through measure(), a profiled call should not nest deeper
+        profiler = self.profiler
+        profiler.enter(profiler.key(callee))
+        try:
+            return callee.call(self, args, expr.span)
+        finally:
+            profiler.exit()
+
+    def visit_return_stmnt(self, stmnt: at.Return) -> Completion:
+        completion = super().visit_return_stmnt(stmnt)
+        if completion is Completion.TAIL_CALL:
+            self.profiler.tail_call(self.profiler.key(self.tail_call[0]))
+        return completion
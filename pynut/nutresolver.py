@@ -21,10 +21,18 @@ class ClassType(Enum):
     INTERFACE = 3
 
 
+class Local:
+    __slots__ = ("slot", "defined")
+
+    def __init__(self, slot: int, defined: bool = False) -> None:
+        self.slot = slot
+        self.defined = defined
+
+
 class Resolver(ExprVisitor, StmntVisitor):
     def __init__(self, interpreter: Interpreter):
         self.interpreter = interpreter
-        self.scopes: list[dict[str, bool]] = []
+        self.scopes: list[dict[str, Local]] = []
         self.current_function: FunctionType = FunctionType.NONE
         self.current_class: ClassType = ClassType.NONE
 
@@ -51,16 +59,17 @@ class Resolver(ExprVisitor, StmntVisitor):
         if name.value in self.scopes[-1]:
             self.interpreter.context.error_span(f"Variable {name.value} already declared in this scope.", name.span)
 
-        self.scopes[-1][name.value] = False
+        scope = self.scopes[-1]
+        scope[name.value] = Local(len(scope))
 
 
     def define(self, name: Token):
         if not self.scopes:
             return
-        self.scopes[-1][name.value] = True
+        self.scopes[-1][name.value].defined = True
 
     def visit_variable_expr(self, expr: at.Variable) -> Any:        
-        if self.scopes and  expr.name.value in self.scopes[-1] and self.scopes[-1][expr.name.value] is False:
+        if self.scopes and  expr.name.value in self.scopes[-1] and not self.scopes[-1][expr.name.value].defined:
             self.interpreter.context.error_span("Cannot read local variable in its own initializer.", expr.name.span)
 
         self.resolve_local(expr, expr.name)
@@ -71,11 +80,31 @@ class Resolver(ExprVisitor, StmntVisitor):
     def visit_set_expr(self, expr: 'at.Set') -> Any:
         self.resolve(expr.value)
         self.resolve(expr.object)
+
+    def visit_array_expr(self, expr: 'at.ArrayLiteral') -> Any:
+        for element in expr.elements:
+            self.resolve(element)
+
+    def visit_index_expr(self, expr: 'at.Index') -> Any:
+        self.resolve(expr.object)
+        self.resolve(expr.index)
+
+    def visit_slice_expr(self, expr: 'at.Slice') -> Any:
+        self.resolve(expr.object)
+        if expr.start is not None:
+            self.resolve(expr.start)
+        if expr.end is not None:
+            self.resolve(expr.end)
+
+    def visit_set_index_expr(self, expr: 'at.SetIndex') -> Any:
+        self.resolve(expr.value)
+        self.resolve(expr.index)
+        self.resolve(expr.object)
         
     def resolve_local(self, expr: at.Expr, name: Token):
         for idx, scope in enumerate(self.scopes[::-1]):
             if name.value in scope:
-                self.interpreter.resolve(expr, idx)
+                self.interpreter.resolve(expr, idx, scope[name.value].slot)
                 return
 
     def visit_assign_expr(self, expr: 'at.Assign') -> Any:
@@ -93,6 +122,10 @@ class Resolver(ExprVisitor, StmntVisitor):
         self.current_function = _type
         self.begin_scope()
 
+        # methods get their receiver as a hidden first parameter
+        if _type in (FunctionType.METHOD, FunctionType.INITIALIZER):
+            self.scopes[-1]["this"] = Local(0, True)
+
         for tok in stmnt.params:
             self.declare(tok)
             self.define(tok)
@@ -117,12 +150,13 @@ class Resolver(ExprVisitor, StmntVisitor):
 
     def visit_return_stmnt(self, stmnt: 'at.Return') -> Any:
         if self.current_function is FunctionType.NONE:
-            self.interpreter.context.error_span("Cannot return from top-level code.", stmnt.keyword.span)
+            self.interpreter.context.error_span("Cannot return from top-level code.", stmnt.span)
         
         if stmnt.value is not None:
             if self.current_function is FunctionType.INITIALIZER:
                 self.interpreter.context.error_span("Cannot return a value from an initializer.", stmnt.span)
             self.resolve(stmnt.value)
+            stmnt.tail = isinstance(stmnt.value, at.Call)
 
     def visit_class_stmnt(self, stmnt: 'at.Class') -> Any:
         enclosing = self.current_class
@@ -132,8 +166,8 @@ class Resolver(ExprVisitor, StmntVisitor):
         self.define(stmnt.name)
 
 
-        self.begin_scope()
-        self.scopes[-1]["this"] = True
+        for method in stmnt.static_methods:
+            self.resolve_function(method, FunctionType.STATIC)
 
         for method in stmnt.methods:
             dec = FunctionType.METHOD
@@ -141,11 +175,6 @@ class Resolver(ExprVisitor, StmntVisitor):
                 dec = FunctionType.INITIALIZER
             self.resolve_function(method, dec)
 
-        for method in stmnt.static_methods:
-            self.resolve_function(method, FunctionType.STATIC)
-            
-
-        self.end_scope()
         self.current_class = enclosing
 
     def visit_this_expr(self, expr: 'at.This') -> Any:
@@ -0,0 +1,92 @@
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+from typing import Optional
+from utils import SpanTable
+from nutastinterpreter import Interpreter
+from nutcallable import NutFunction
+import nutast as at
+
+
+# frames whose 'stmnt' local is the statement being executed
+_STATEMENT_CODES = {Interpreter.execute.__code__, Interpreter.execute_block.__code__}
+_FUNCTION_CODE = NutFunction.run.__code__
+_MODULE_CODE = Interpreter.interpret.__code__
+
+
+class Sampler:
+    """Samples the Nut call stack of the tree-walking interpreter.
+
+    A daemon thread wakes every ``interval`` seconds and walks the Python
+    frames of the thread running the program. NutFunction.run frames mark
+    Nut calls, and the innermost statement under each one gives its line, so
+    the interpreter itself runs unmodified and the cost is the sampler's own
+    time holding the GIL. Stacks are counted in the collapsed format of
+    flamegraph.pl and speedscope, one 'frame;frame;... count' per line with
+    frames written as 'function:line'.
+    """
+
+    def __init__(self, spans: SpanTable, interval: float = 0.01) -> None:
+        # the program's spans, for the line of each statement
+        self.lines = spans.lines
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+        self.samples = 0
+        self.target: Optional[int] = None
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Starts sampling the calling thread."""
+        self.target = threading.get_ident()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="nut-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is not None and (stack := self.stack(frame)):
+                self.counts[stack] += 1
+                self.samples += 1
+
+    def stack(self, frame: Optional[FrameType]) -> str:
+        lines = self.lines
+        frames: list[str] = []
+        line: Optional[int] = None
+
+        # innermost first: the first statement seen belongs to the innermost Nut call
+        while frame is not None:
+            code = frame.f_code
+            if code in _STATEMENT_CODES:
+                if line is None:
+                    stmnt = frame.f_locals.get("stmnt")
+                    if isinstance(stmnt, at.Stmnt) and stmnt.span is not None:
+                        line = lines[stmnt.span]
+            elif code is _FUNCTION_CODE:
+                # 'function' rather than self, tail calls replace it in the same frame
+                function = frame.f_locals.get("function")
+                if function is not None:
+                    frames.append(f"{function.callable.name.value}:{line or lines[function.callable.span]}")
+                line = None
+            elif code is _MODULE_CODE:
+                frames.append(f"<module>:{line or 0}")
+                break
+            frame = frame.f_back
+
+        return ";".join(reversed(frames))
+
+    def collapsed(self) -> list[str]:
+        return [f"{stack} {count}" for stack, count in self.counts.most_common()]
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            for line in self.collapsed():
+                f.write(line + "\n")
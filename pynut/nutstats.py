@@ -0,0 +1,82 @@
+import sys
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Any
+from nutastinterpreter import Interpreter
+from nutcallable import NutBoundMethod, NutFunction
+from nutclass import NutClass, NutInstance
+from nutenvironment import Environment
+from nuterror import Completion, NutBreak
+
+# constructors counted as allocations, by the name they are reported under
+_ALLOCATIONS = {
+    Environment.__init__.__code__: "environments",
+    NutFunction.__init__.__code__: "functions",
+    NutBoundMethod.__init__.__code__: "bound methods",
+    NutInstance.__init__.__code__: "instances",
+    NutClass.__init__.__code__: "classes",
+}
+_CLASS_INIT = NutClass.__init__.__code__
+_INSTANCE_INIT = NutInstance.__init__.__code__
+_BREAK_INIT = NutBreak.__init__.__code__
+
+
+class ExecutionStats:
+    """Counts the work the tree-walking interpreter does while a program runs.
+
+    Every call of a visit_* method, every Environment, NutFunction,
+    NutBoundMethod (what bind makes), NutInstance and NutClass created, and
+    how statements completed. A profile hook picks these out by code object,
+    so the interpreter runs unmodified and without extra Python frames, but
+    every Python call goes through the hook while counting.
+    """
+
+    def __init__(self, interpreter: Interpreter) -> None:
+        self.visits: Counter[str] = Counter()
+        self.allocations: Counter[str] = Counter()
+        self.completions: Counter[str] = Counter()
+        # the visit_* methods the interpreter really runs, subclasses may override them
+        self.visit_codes: dict[CodeType, str] = {}
+        for name in dir(type(interpreter)):
+            if name.startswith("visit_"):
+                self.visit_codes[getattr(type(interpreter), name).__code__] = name
+        self.return_code = type(interpreter).visit_return_stmnt.__code__
+
+    def start(self) -> None:
+        """Starts counting in the calling thread."""
+        sys.setprofile(self.event)
+
+    def stop(self) -> None:
+        sys.setprofile(None)
+
+    def event(self, frame: FrameType, event: str, arg: Any) -> None:
+        code = frame.f_code
+        if event == "call":
+            if (name := self.visit_codes.get(code)) is not None:
+                self.visits[name] += 1
+            elif (name := _ALLOCATIONS.get(code)) is not None:
+                # a class is an instance too, only count it as the class
+                if code is not _INSTANCE_INIT or frame.f_back.f_code is not _CLASS_INIT:
+                    self.allocations[name] += 1
+            elif code is _BREAK_INIT:
+                self.completions["NutBreak raised"] += 1
+        elif event == "return" and code is self.return_code:
+            if arg is Completion.RETURN:
+                self.completions["returns"] += 1
+            elif arg is Completion.TAIL_CALL:
+                self.completions["tail calls"] += 1
+
+    def report(self) -> None:
+        print(f"stats: {sum(self.visits.values())} node visits")
+        for name, count in self.visits.most_common():
+            print(f"{count:>12}  {name}")
+
+        print(f"\n{sum(self.allocations.values()):>12}  objects created")
+        for name in _ALLOCATIONS.values():
+            print(f"{self.allocations[name]:>12}  {name}")
+
+        print()
+        for name in ("returns", "tail calls"):
+            print(f"{self.completions[name]:>12}  {name}")
+        print(f"{self.visits['visit_break_stmnt']:>12}  breaks")
+        print(f"{self.completions['NutBreak raised']:>12}  NutBreak raised")
@@ -1,16 +1,21 @@
-from enum import Enum, auto
-from dataclasses import dataclass
+from array import array
+from enum import IntEnum, auto
+from sys import intern
 
-from typing import Union
-from utils import Span
+from typing import Iterable, Iterator, Union
+from utils import SpanId
 
 
-class TokenType(Enum):
+# an int so a TokenBuffer can keep token types as one byte codes
+class TokenType(IntEnum):
     LEFT_PAREN = auto()
     RIGHT_PAREN = auto()
     LEFT_BRACE = auto()
     RIGHT_BRACE = auto()
+    LEFT_BRACKET = auto()
+    RIGHT_BRACKET = auto()
 
+    COLON = auto()
     COMMA = auto()
     DOT = auto()
     MINUS = auto()
@@ -63,8 +68,64 @@ class TokenType(Enum):
     EOF = auto()
 
 
-@dataclass(unsafe_hash=True)
 class Token:
-    type: TokenType
-    value: Union[str, float]
-    span: Span
\ No newline at end of file
+    def __init__(self, type: TokenType, value: Union[str, float], span: SpanId) -> None:
+        self.type = type
+        self.value = value
+        self.span = span
+
+    def __repr__(self) -> str:
+        return f"Token({self.type.name}, {self.value!r}, {self.span})"
+
+
+class TokenBuffer:
+    """The tokens of a source as parallel arrays, one entry per token.
+
+    Types are kept as their TokenType codes and spans as their ids in the
+    Context's SpanTable. Values are indexes into ``values``, where every
+    distinct identifier, keyword, operator, string and number is stored once.
+    Strings there are interned, so a name is the same object everywhere it is
+    used, in every program and in the interpreter's own code, and dict
+    lookups by name succeed on identity. Token objects are only made when
+    asked for, about 21 bytes a token with its span instead of a Token and a
+    Span each.
+    """
+
+    def __init__(self) -> None:
+        self.types = array("B")
+        self.span_ids = array("I")
+        self.value_ids = array("I")
+        self.values: list[Union[str, float]] = []
+        # value -> its index in values
+        self.interned: dict[Union[str, float], int] = {}
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[Token]) -> "TokenBuffer":
+        buffer = cls()
+        for token in tokens:
+            buffer.append(token.type, token.value, token.span)
+        return buffer
+
+    def append(self, type: TokenType, value: Union[str, float], span: SpanId) -> None:
+        if (value_id := self.interned.get(value)) is None:
+            value_id = self.interned[value] = len(self.values)
+            self.values.append(intern(value) if isinstance(value, str) else value)
+        self.types.append(type)
+        self.span_ids.append(span)
+        self.value_ids.append(value_id)
+
+    def token(self, index: int) -> Token:
+        return Token(_TYPES[self.types[index]], self.values[self.value_ids[index]], self.span_ids[index])
+
+    def span(self, index: int) -> SpanId:
+        return self.span_ids[index]
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __iter__(self) -> Iterator[Token]:
+        return map(self.token, range(len(self.types)))
+
+
+# TokenType by code
+_TYPES = {int(t): t for t in TokenType}
@@ -0,0 +1,540 @@
+import math
+from typing import Any, Optional
+from utils import Context, SpanId
+from nutvisitor import ExprVisitor, StmntVisitor
+import nutast as at
+from nuttoken import Token, TokenType
+from nutcallable import NutCallable, NutFunction
+from nutclass import NutClass, NutInstance
+from nutarray import NutArray
+from nutmap import INDEXABLE
+from nuterror import NutBreak
+from nutastinterpreter import Interpreter
+
+
+class PyFunction(NutFunction):
+    """A Nut function whose body was transpiled to a Python function."""
+
+    def __init__(self, function: at.Function, code, is_init=False):
+        super().__init__(function, None, is_init)
+        self.code = code
+
+    def call(self, interpreter, arguments: list, span: SpanId):
+        result = self.code(*arguments)
+        return arguments[0] if self.is_init else result
+
+
+class Binding:
+    """A Nut local lowered to a Python name.
+
+    Locals become plain Python locals. A local that a nested function reads
+    is handed to it as a keyword-only default, so it is captured when the
+    function is defined just like a Nut closure captures its Environment.
+    If it can also change after that, it is kept in a one element list
+    (boxed) so both sides share updates.
+    """
+    __slots__ = ("name", "function", "captured", "assigned", "declared_late")
+
+    def __init__(self, name: str, function: 'FunctionInfo', declared_late: bool = False) -> None:
+        self.name = name
+        self.function = function
+        self.captured = False
+        self.assigned = False
+        # functions and classes can refer to themselves before their value exists
+        self.declared_late = declared_late
+
+    @property
+    def boxed(self) -> bool:
+        return self.captured and (self.assigned or self.declared_late)
+
+
+class FunctionInfo:
+    __slots__ = ("free",)
+
+    def __init__(self) -> None:
+        self.free: dict[int, Binding] = {}
+
+
+class Transpiler(ExprVisitor, StmntVisitor):
+    """Lowers a resolved AST to Python source.
+
+    Runs twice over the same statements: the first pass only records which
+    locals are captured or reassigned, the second emits code with that
+    knowledge. Anything that can fail at runtime goes through a check that
+    reports against the span recorded in the interpreter's span table.
+    """
+
+    def __init__(self, interpreter: 'PythonInterpreter') -> None:
+        self.interpreter = interpreter
+        # what the first pass found out about each declaration and function, by id()
+        self.bindings: dict[int, Binding] = {}
+        self.functions: dict[int, FunctionInfo] = {}
+        # loops whose condition or body (outside nested loops) makes a call, by id()
+        self.calling_loops: set[int] = set()
+        self.counter = 0
+
+    def transpile(self, statements: list[at.Stmnt]) -> str:
+        # keyed by id() of nodes that only live as long as this call, so they
+        # cannot be left for a later call (the REPL frees old nodes) to reuse
+        self.bindings = {}
+        self.functions = {}
+        self.calling_loops = set()
+        main = FunctionInfo()
+        self.emitting = False
+        self.run(statements, main)
+        self.emitting = True
+        return self.run(statements, main)
+
+    def run(self, statements: list[at.Stmnt], main: FunctionInfo) -> str:
+        self.lines: list[str] = []
+        self.indent = 1
+        self.scopes: list[list[Binding]] = []
+        self.function_stack: list[FunctionInfo] = [main]
+        # the loops around the code being visited, innermost last
+        self.loops: list[at.While] = []
+
+        self.emit("def _main():")
+        self.block(statements)
+        return "\n".join(self.lines) + "\n"
+
+    def fresh(self, prefix: str) -> str:
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def emit(self, line: str) -> None:
+        if self.emitting:
+            self.lines.append("    " * (self.indent - 1) + line)
+
+    def block(self, statements: list[at.Stmnt]) -> None:
+        self.indent += 1
+        start = len(self.lines)
+        for s in statements:
+            s.accept(self)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.indent -= 1
+
+    def constant(self, value: Any) -> str:
+        return self.interpreter.constant(value) if self.emitting else "0"
+
+    def span(self, span: Optional[SpanId]) -> int:
+        return self.interpreter.span(span) if self.emitting else 0
+
+    def literal(self, value: Any) -> str:
+        if isinstance(value, float) and not math.isfinite(value):
+            return f"_K[{self.constant(value)}]"
+        return repr(value)
+
+    # -- bindings ---------------------------------------------------------------
+
+    def declare(self, key: object, name: str, declared_late: bool = False) -> Optional[Binding]:
+        if not self.scopes:
+            return None
+
+        binding = self.bindings.get(id(key))
+        if binding is None:
+            binding = Binding(self.fresh(f"v_{name}_"), self.function_stack[-1], declared_late)
+            self.bindings[id(key)] = binding
+        self.scopes[-1].append(binding)
+        return binding
+
+    def lookup(self, depth: int, slot: int) -> Binding:
+        binding = self.scopes[-1 - depth][slot]
+
+        if binding.function is not self.function_stack[-1]:
+            binding.captured = True
+            for info in reversed(self.function_stack):
+                if info is binding.function:
+                    break
+                info.free[id(binding)] = binding
+        return binding
+
+    def define(self, name: Token, binding: Optional[Binding], value: str) -> None:
+        if binding is None:
+            self.emit(f"G[{name.value!r}] = {value}")
+        elif binding.boxed and not binding.declared_late:
+            self.emit(f"{binding.name} = [{value}]")
+        elif binding.boxed:
+            self.emit(f"{binding.name}[0] = {value}")
+        else:
+            self.emit(f"{binding.name} = {value}")
+
+    def read(self, binding: Binding) -> str:
+        return f"{binding.name}[0]" if binding.boxed else binding.name
+
+    # -- expressions ------------------------------------------------------------
+
+    def visit_literal_expr(self, expr: at.Literal) -> str:
+        return self.literal(expr.value)
+
+    def visit_grouping_expr(self, expr: at.Grouping) -> str:
+        return expr.expression.accept(self)
+
+    def visit_variable_expr(self, expr: at.Variable) -> str:
+        if expr.depth is None:
+            name = expr.name.value
+            return f"(G[{name!r}] if {name!r} in G else _get_global({name!r}, {self.span(expr.name.span)}))"
+        return self.read(self.lookup(expr.depth, expr.slot))
+
+    def visit_this_expr(self, expr: at.This) -> str:
+        return self.read(self.lookup(expr.depth, expr.slot))
+
+    def visit_assign_expr(self, expr: at.Assign) -> str:
+        value = expr.value.accept(self)
+
+        if expr.depth is None:
+            return f"_set_global({expr.name.value!r}, {value}, {self.span(expr.name.span)})"
+
+        binding = self.lookup(expr.depth, expr.slot)
+        binding.assigned = True
+        if binding.boxed:
+            t = self.fresh("_t")
+            return f"({binding.name}.__setitem__(0, {t} := {value}) or {t})"
+        return f"({binding.name} := {value})"
+
+    def visit_unary_expr(self, expr: at.Unary) -> str:
+        right = expr.right.accept(self)
+
+        if expr.operator.type is TokenType.BANG:
+            return f"(not {right})"
+
+        t = self.fresh("_t")
+        return f"(-{t} if type({t} := {right}) is float else _negate({t}, {self.span(expr.operator.span)}))"
+
+    def visit_binary_expr(self, expr: at.Binary) -> str:
+        chain = [expr]
+        while type(chain[-1].left) is at.Binary:
+            chain.append(chain[-1].left)
+        if len(chain) <= _NESTED_CHAIN:
+            return self.binary(expr, expr.left.accept(self), expr.right.accept(self))
+
+        # a + b + c + ... nests a level per operator, and Python's parser gives up
+        # at 200 parentheses, so a long chain is emitted flat: one tuple item per
+        # operator, each storing its result in t for the next to read
+        t = self.fresh("_t")
+        steps = [f"({t} := {chain[-1].left.accept(self)})"]
+        for e in reversed(chain):
+            steps.append(f"({t} := {self.binary(e, t, e.right.accept(self))})")
+        return f"({', '.join(steps)})[-1]"
+
+    def binary(self, expr: at.Binary, left: str, right: str) -> str:
+        op = _OPERATORS[expr.operator.type]
+
+        if op in ("==", "!="):
+            return f"({left} {op} {right})"
+
+        a, b = self.fresh("_t"), self.fresh("_t")
+        span = self.span(expr.span)
+
+        if op == "+":
+            return f"({a} + {b} if type({a} := {left}) is type({b} := {right}) in _ADDABLE else _add({a}, {b}, {span}))"
+        return f"({a} {op} {b} if type({a} := {left}) is type({b} := {right}) is float else _numeric({a}, {b}, {op!r}, {span}))"
+
+    def visit_logical_expr(self, expr: at.Logical) -> str:
+        op = "or" if expr.operator.type is TokenType.OR else "and"
+        # a or b or c ... needs no parentheses between its operands
+        operands = [expr.right]
+        while type(expr.left) is at.Logical and expr.left.operator.type is expr.operator.type:
+            expr = expr.left
+            operands.append(expr.right)
+        operands.append(expr.left)
+        return f"({f' {op} '.join(o.accept(self) for o in reversed(operands))})"
+
+    def visit_call_expr(self, expr: at.Call) -> str:
+        if self.loops:
+            self.calling_loops.add(id(self.loops[-1]))
+
+        if type(expr.callee) is at.Get:
+            return self.invoke(expr, expr.callee)
+
+        callee = expr.callee.accept(self)
+        args = ", ".join(arg.accept(self) for arg in expr.arguments)
+        t = self.fresh("_t")
+        return (f"({t}.code({args}) if type({t} := {callee}) is _PyFunction and {t}.arity == {len(expr.arguments)} "
+                f"else _call({t}, [{args}], {self.span(expr.span)}))")
+
+    def invoke(self, expr: at.Call, callee: at.Get) -> str:
+        # obj.name(args) calls the method's code with obj as 'this', no bound method is made
+        obj = callee.object.accept(self)
+        o, m = self.fresh("_t"), self.fresh("_t")
+        args = [arg.accept(self) for arg in expr.arguments]
+        name, cache = callee.name.value, self.constant(callee.cache)
+        return (f"({m}.code({', '.join([o, *args])}) if isinstance({o} := {obj}, _NutInstance) "
+                f"and type({m} := {o}.get_method({name!r}, _K[{cache}])) is _PyFunction "
+                f"and {m}.arity == {len(args)} and not {m}.is_init "
+                f"else _call({self.get(callee, o, o)}, [{', '.join(args)}], {self.span(expr.span)}))")
+
+    def get(self, expr: at.Get, t: str, obj: str) -> str:
+        # obj is evaluated once, by the isinstance check, and then read back from t
+        return (f"({t}.get({expr.name.value!r}, _S[{self.span(expr.name.span)}], _K[{self.constant(expr.cache)}]) "
+                f"if isinstance({obj}, _NutInstance) "
+                f"else _not_instance({self.span(expr.span)}, 'Only instances have properties'))")
+
+    def visit_get_expr(self, expr: at.Get) -> str:
+        obj = expr.object.accept(self)
+        t = self.fresh("_t")
+        return self.get(expr, t, f"{t} := {obj}")
+
+    def visit_set_expr(self, expr: at.Set) -> str:
+        obj = expr.object.accept(self)
+        value = expr.value.accept(self)
+        t, v = self.fresh("_t"), self.fresh("_t")
+        return (f"({t}.set({expr.name.value!r}, ({v} := {value}), _K[{self.constant(expr.cache)}]) or {v} if isinstance({t} := {obj}, _NutInstance) "
+                f"else _not_instance({self.span(expr.span)}, 'Only instances have fields'))")
+
+    def visit_array_expr(self, expr: at.ArrayLiteral) -> str:
+        return f"_array([{', '.join(element.accept(self) for element in expr.elements)}])"
+
+    def visit_index_expr(self, expr: at.Index) -> str:
+        return f"_get_index({expr.object.accept(self)}, {expr.index.accept(self)}, {self.span(expr.span)})"
+
+    def visit_slice_expr(self, expr: at.Slice) -> str:
+        start = "None" if expr.start is None else expr.start.accept(self)
+        end = "None" if expr.end is None else expr.end.accept(self)
+        return f"_slice({expr.object.accept(self)}, {start}, {end}, {self.span(expr.span)})"
+
+    def visit_set_index_expr(self, expr: at.SetIndex) -> str:
+        return (f"_set_index({expr.object.accept(self)}, {expr.index.accept(self)}, "
+                f"{expr.value.accept(self)}, {self.span(expr.span)})")
+
+    # -- statements -------------------------------------------------------------
+
+    def visit_expression_stmnt(self, stmnt: at.Expression) -> None:
+        expr = stmnt.expression
+
+        # plain local assignments read better (and run faster) as statements
+        if isinstance(expr, at.Assign) and expr.depth is not None:
+            value = expr.value.accept(self)
+            binding = self.lookup(expr.depth, expr.slot)
+            binding.assigned = True
+            self.emit(f"{self.read(binding)} = {value}")
+            return
+
+        self.emit(expr.accept(self))
+
+    def visit_print_stmnt(self, stmnt: at.Print) -> None:
+        self.emit(f"print({stmnt.expression.accept(self)})")
+
+    def visit_var_stmnt(self, stmnt: at.Var) -> None:
+        binding = self.declare(stmnt.name, stmnt.name.value)
+        value = "None" if stmnt.initializer is None else stmnt.initializer.accept(self)
+        self.define(stmnt.name, binding, value)
+
+    def visit_block_stmnt(self, stmnt: at.Block) -> None:
+        self.scopes.append([])
+        for s in stmnt.statements:
+            s.accept(self)
+        self.scopes.pop()
+
+    def visit_if_stmnt(self, stmnt: at.If) -> None:
+        self.emit(f"if {stmnt.condition.accept(self)}:")
+        self.block([stmnt.then_branch])
+
+        if stmnt.else_branch is not None:
+            self.emit("else:")
+            self.block([stmnt.else_branch])
+
+    def visit_while_stmnt(self, stmnt: at.While) -> None:
+        # a break in a function that has no loop of its own ends the loop it was
+        # called from, condition included. The try goes around the while, and only
+        # on loops that make calls, as Python allows just 20 nested blocks
+        catches = id(stmnt) in self.calling_loops
+        if catches:
+            self.emit("try:")
+            self.indent += 1
+
+        self.loops.append(stmnt)
+        self.emit(f"while {stmnt.condition.accept(self)}:")
+        self.block([stmnt.body])
+        self.loops.pop()
+
+        if catches:
+            self.indent -= 1
+            self.emit("except _NutBreak:")
+            self.emit("    pass")
+
+    def visit_break_stmnt(self, stmnt: at.Break) -> None:
+        if self.loops:
+            self.emit("break")
+        else:
+            self.emit(f"raise _NutBreak(_S[{self.span(stmnt.span)}])")
+
+    def visit_return_stmnt(self, stmnt: at.Return) -> None:
+        self.emit("return" if not stmnt.value else f"return {stmnt.value.accept(self)}")
+
+    def function(self, stmnt: at.Function, method: bool = False) -> str:
+        """Emits a def for stmnt and returns the name of the Python function."""
+        info = self.functions.setdefault(id(stmnt), FunctionInfo())
+        name = self.fresh(f"f_{stmnt.name.value}_")
+
+        self.function_stack.append(info)
+        self.scopes.append([])
+        # a method receives 'this' as its first parameter
+        params = [self.declare(stmnt, "this")] if method else []
+        params.extend(self.declare(p, p.value) for p in stmnt.params)
+
+        enclosing_lines, self.lines = self.lines, []
+        enclosing_loops, self.loops = self.loops, []
+        enclosing_indent, self.indent = self.indent, 1
+
+        for p in params:
+            if p.boxed:
+                self.emit(f"    {p.name} = [{p.name}]")
+        self.block(stmnt.body)
+
+        body, self.lines = self.lines, enclosing_lines
+        self.loops, self.indent = enclosing_loops, enclosing_indent
+        self.scopes.pop()
+        self.function_stack.pop()
+
+        signature = [p.name for p in params]
+        if info.free:
+            signature.append("*")
+            signature.extend(f"{b.name}={b.name}" for b in info.free.values())
+
+        self.emit(f"def {name}({', '.join(signature)}):")
+        if self.emitting:
+            self.lines.extend("    " * (self.indent - 1) + line for line in body)
+        return name
+
+    def visit_function(self, stmnt: at.Function) -> None:
+        binding = self.declare(stmnt.name, stmnt.name.value, declared_late=True)
+        if binding is not None and binding.boxed:
+            self.emit(f"{binding.name} = [None]")
+
+        code = self.function(stmnt)
+        self.define(stmnt.name, binding, f"_PyFunction(_K[{self.constant(stmnt)}], {code})")
+
+    def visit_class_stmnt(self, stmnt: at.Class) -> None:
+        binding = self.declare(stmnt.name, stmnt.name.value, declared_late=True)
+        if binding is not None and binding.boxed:
+            self.emit(f"{binding.name} = [None]")
+
+        static_methods = [(m, self.function(m)) for m in stmnt.static_methods]
+
+        methods = [(m, self.function(m, method=True)) for m in stmnt.methods]
+
+        methods_src = ", ".join(
+            f"{m.name.value!r}: _PyFunction(_K[{self.constant(m)}], {code}, {m.name.value == 'init'})" for m, code in methods)
+        static_src = ", ".join(
+            f"{m.name.value!r}: _PyFunction(_K[{self.constant(m)}], {code})" for m, code in static_methods)
+        self.define(stmnt.name, binding, f"_NutClass({stmnt.name.value!r}, {{{methods_src}}}, {{{static_src}}})")
+
+
+# left-associative chains up to this many operators are emitted as nested expressions
+_NESTED_CHAIN = 8
+
+_OPERATORS = {
+    TokenType.PLUS: "+",
+    TokenType.MINUS: "-",
+    TokenType.STAR: "*",
+    TokenType.SLASH: "/",
+    TokenType.EQUAL_EQUAL: "==",
+    TokenType.BANG_EQUAL: "!=",
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+}
+
+
+class PythonInterpreter(Interpreter):
+    """Transpiles each top-level statement to Python and runs it with exec."""
+
+    def __init__(self, context: Context):
+        super().__init__(context)
+        self.transpiler = Transpiler(self)
+        self.constants: list[Any] = []
+        self.spans: list[Optional[SpanId]] = []
+        self.namespace = {
+            "G": self.globals.values,
+            "_K": self.constants,
+            "_S": self.spans,
+            "_ADDABLE": (float, str),
+            "_PyFunction": PyFunction,
+            "_NutClass": NutClass,
+            "_NutInstance": NutInstance,
+            "_NutBreak": NutBreak,
+            "_call": self.rt_call,
+            "_add": self.rt_add,
+            "_numeric": self.rt_numeric,
+            "_negate": self.rt_negate,
+            "_not_instance": self.rt_not_instance,
+            "_get_global": self.rt_get_global,
+            "_set_global": self.rt_set_global,
+            "_array": NutArray.of,
+            "_get_index": self.rt_get_index,
+            "_set_index": self.rt_set_index,
+            "_slice": self.rt_slice,
+        }
+
+    def constant(self, value: Any) -> str:
+        self.constants.append(value)
+        return str(len(self.constants) - 1)
+
+    def span(self, span: Optional[SpanId]) -> int:
+        self.spans.append(span)
+        return len(self.spans) - 1
+
+    def execute(self, stmnt: at.Stmnt) -> None:
+        source = self.transpiler.transpile([stmnt])
+        exec(compile(source, self.context.file_name if self.context else "<nut>", "exec"), self.namespace)
+        self.namespace["_main"]()
+
+    def rt_call(self, callee: Any, args: list, span: int) -> Any:
+        if not isinstance(callee, NutCallable):
+            raise self.error(self.spans[span], "Can only call functions and classes")
+
+        if callee.arity != (y := len(args)):
+            raise self.error(self.spans[span], f"expected {callee.arity} args got {y}")
+
+        return callee.call(self, args, self.spans[span])
+
+    def rt_add(self, left: Any, right: Any, span: int) -> Any:
+        if (isinstance(left, float) and isinstance(right, float)) or (isinstance(left, str) and isinstance(right, str)):
+            return left + right
+        raise self.error(self.spans[span], f"Oprands must be of type number or string, not {type(left)} and {type(right)}")
+
+    def rt_numeric(self, left: Any, right: Any, op: str, span: int) -> Any:
+        self.check_number_oprands(self.spans[span], left, right)
+        return _NUMERIC[op](left, right)
+
+    def rt_negate(self, right: Any, span: int) -> Any:
+        raise self.error(self.spans[span], f"expected Number got {type(right)}")
+
+    def rt_not_instance(self, span: int, message: str) -> Any:
+        raise self.error(self.spans[span], message)
+
+    def rt_get_global(self, name: str, span: int) -> Any:
+        return self.globals.get(name, self.spans[span])
+
+    def rt_set_global(self, name: str, value: Any, span: int) -> Any:
+        self.globals.set(name, value, self.spans[span])
+        return value
+
+    def rt_get_index(self, obj: Any, index: Any, span: int) -> Any:
+        if not isinstance(obj, INDEXABLE):
+            raise self.error(self.spans[span], "Only arrays and maps can be indexed")
+        return obj.get(index, self.spans[span])
+
+    def rt_set_index(self, obj: Any, index: Any, value: Any, span: int) -> Any:
+        if not isinstance(obj, INDEXABLE):
+            raise self.error(self.spans[span], "Only arrays and maps can be indexed")
+        obj.set(index, value, self.spans[span])
+        return value
+
+    def rt_slice(self, obj: Any, start: Any, end: Any, span: int) -> Any:
+        if not isinstance(obj, NutArray):
+            raise self.error(self.spans[span], "Only arrays can be sliced")
+        return obj.slice(start, end, self.spans[span])
+
+
+_NUMERIC = {
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
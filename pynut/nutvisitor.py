@@ -47,6 +47,22 @@ class ExprVisitor(ABC):
     def visit_this_expr(self, expr: 'at.This') -> Any:
         ...
 
+    @abstractmethod
+    def visit_array_expr(self, expr: 'at.ArrayLiteral') -> Any:
+        ...
+
+    @abstractmethod
+    def visit_index_expr(self, expr: 'at.Index') -> Any:
+        ...
+
+    @abstractmethod
+    def visit_slice_expr(self, expr: 'at.Slice') -> Any:
+        ...
+
+    @abstractmethod
+    def visit_set_index_expr(self, expr: 'at.SetIndex') -> Any:
+        ...
+
 
 class StmntVisitor(ABC):
     @abstractmethod
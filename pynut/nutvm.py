@@ -0,0 +1,329 @@
+from typing import Any
+from utils import Context, SpanId
+from nutchunk import Chunk, OpCode
+from nutcompiler import Compiler, FunctionProto, ClassProto
+from nutcallable import NutBoundMethod, NutCallable, NutFunction
+from nutclass import NutClass, NutInstance
+from nutarray import NutArray
+from nutmap import INDEXABLE
+from nuterror import NutBreak
+from nutenvironment import Environment
+from nutastinterpreter import Interpreter
+import nutast as at
+
+
+class VMFunction(NutFunction):
+    def __init__(self, proto: FunctionProto, closure, is_init=False):
+        super().__init__(proto.node, closure, is_init)
+        self.proto = proto
+
+    def call(self, interpreter, arguments: list, span: SpanId):
+        return interpreter.vm.run(self.proto.chunk, Environment(self.closure, arguments), self)
+
+
+(CONSTANT, NIL, TRUE, FALSE, POP,
+ GET_LOCAL, SET_LOCAL, DEFINE_LOCAL, GET_GLOBAL, SET_GLOBAL, DEFINE_GLOBAL, GET_PROPERTY, SET_PROPERTY,
+ BUILD_ARRAY, GET_INDEX, SET_INDEX, SLICE,
+ EQUAL, NOT_EQUAL, GREATER, GREATER_EQUAL, LESS, LESS_EQUAL, ADD, SUBTRACT, MULTIPLY, DIVIDE, NOT, NEGATE,
+ PRINT, JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE, POP_JUMP_IF_FALSE, BREAK_OUTSIDE_LOOP,
+ PUSH_SCOPE, POP_SCOPE, CALL, CLOSURE, CLASS, RETURN) = map(int, OpCode)
+
+
+class VM:
+    """A stack machine over Chunks.
+
+    Calls to Nut functions and classes push a frame and stay inside the same
+    dispatch loop; ``run`` is only re-entered when a VMFunction is called
+    from outside it through NutCallable.call.
+    """
+
+    def __init__(self, interpreter: 'VMInterpreter') -> None:
+        self.interpreter = interpreter
+
+    def run(self, chunk: Chunk, env: Any, function: Any = None) -> Any:
+        intp = self.interpreter
+        globals_ = intp.globals.values
+        stack: list[Any] = []
+        push = stack.append
+        pop = stack.pop
+        frames: list[tuple] = []
+
+        code, constants, spans, exits = chunk.code, chunk.constants, chunk.spans, chunk.loop_exits
+        ip = 0
+        # the call frame of the running function, its slot 0 holds 'this' in methods
+        frame = env
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                depth = code[ip]
+                e = env
+                while depth:
+                    e = e.enclosing
+                    depth -= 1
+                push(e.values[code[ip + 1]])
+                ip += 2
+
+            elif op == CONSTANT:
+                push(constants[code[ip]])
+                ip += 1
+
+            elif op == GET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                if name in globals_:
+                    push(globals_[name])
+                else:
+                    intp.globals.get(name, None)
+
+            elif op == POP_JUMP_IF_FALSE:
+                if pop():
+                    ip += 1
+                else:
+                    ip = code[ip]
+
+            elif op == JUMP:
+                ip = code[ip]
+
+            elif op == CALL:
+                argc = code[ip]
+                ip += 1
+                args = stack[len(stack) - argc:]
+                del stack[len(stack) - argc:]
+                callee = pop()
+
+                if not isinstance(callee, NutCallable):
+                    raise intp.error(spans[ip], "Can only call functions and classes")
+                if callee.arity != argc:
+                    raise intp.error(spans[ip], f"expected {callee.arity} args got {argc}")
+
+                if isinstance(callee, NutClass):
+                    instance = NutInstance(callee)
+                    init = callee.find_method("init")
+                    if init is None:
+                        push(instance)
+                        continue
+                    args.insert(0, instance)
+                    callee = init
+                elif isinstance(callee, NutBoundMethod):
+                    args.insert(0, callee.instance)
+                    callee = callee.method
+
+                if isinstance(callee, VMFunction):
+                    frames.append((code, constants, spans, exits, ip, env, frame, function, stack))
+                    function = callee
+                    chunk = callee.proto.chunk
+                    code, constants, spans, exits = chunk.code, chunk.constants, chunk.spans, chunk.loop_exits
+                    env = frame = Environment(callee.closure, args)
+                    stack = []
+                    push, pop = stack.append, stack.pop
+                    ip = 0
+                else:
+                    push(callee.call(intp, args, spans[ip]))
+
+            elif op == RETURN:
+                result = pop()
+                if function is not None and function.is_init:
+                    result = frame.values[0]
+                if not frames:
+                    return result
+
+                code, constants, spans, exits, ip, env, frame, function, stack = frames.pop()
+                push, pop = stack.append, stack.pop
+                push(result)
+
+            elif op == ADD:
+                r = pop()
+                l = pop()
+                if (isinstance(l, float) and isinstance(r, float)) or (isinstance(l, str) and isinstance(r, str)):
+                    push(l + r)
+                else:
+                    raise intp.error(spans[ip], f"Oprands must be of type number or string, not {type(l)} and {type(r)}")
+
+            elif op == SUBTRACT:
+                r = pop()
+                l = pop()
+                if l.__class__ is not float or r.__class__ is not float:
+                    intp.check_number_oprands(spans[ip], l, r)
+                push(l - r)
+
+            elif op == LESS:
+                r = pop()
+                l = pop()
+                if l.__class__ is not float or r.__class__ is not float:
+                    intp.check_number_oprands(spans[ip], l, r)
+                push(l < r)
+
+            elif op == POP:
+                pop()
+
+            elif op == SET_LOCAL:
+                depth = code[ip]
+                e = env
+                while depth:
+                    e = e.enclosing
+                    depth -= 1
+                e.values[code[ip + 1]] = stack[-1]
+                ip += 2
+
+            elif op == PUSH_SCOPE:
+                env = Environment(env)
+
+            elif op == POP_SCOPE:
+                env = env.enclosing
+
+            elif op == DEFINE_LOCAL:
+                env.values.append(pop())
+
+            elif op == GET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                obj = pop()
+                if not isinstance(obj, NutInstance):
+                    raise intp.error(spans[ip][0], "Only instances have properties")
+                push(obj.get(name, spans[ip][1]))
+
+            elif op == SET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                value = pop()
+                obj = pop()
+                if not isinstance(obj, NutInstance):
+                    raise intp.error(spans[ip], "Only instances have fields")
+                obj.set(name, value)
+                push(value)
+
+            elif op == GET_INDEX:
+                index = pop()
+                obj = pop()
+                if not isinstance(obj, INDEXABLE):
+                    raise intp.error(spans[ip], "Only arrays and maps can be indexed")
+                push(obj.get(index, spans[ip]))
+
+            elif op == SET_INDEX:
+                value = pop()
+                index = pop()
+                obj = pop()
+                if not isinstance(obj, INDEXABLE):
+                    raise intp.error(spans[ip], "Only arrays and maps can be indexed")
+                obj.set(index, value, spans[ip])
+                push(value)
+
+            elif op == BUILD_ARRAY:
+                count = code[ip]
+                ip += 1
+                items = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                push(NutArray.of(items))
+
+            elif op == SLICE:
+                end = pop()
+                start = pop()
+                obj = pop()
+                if not isinstance(obj, NutArray):
+                    raise intp.error(spans[ip], "Only arrays can be sliced")
+                push(obj.slice(start, end, spans[ip]))
+
+            elif op == MULTIPLY or op == DIVIDE or op == GREATER or op == GREATER_EQUAL or op == LESS_EQUAL:
+                r = pop()
+                l = pop()
+                if l.__class__ is not float or r.__class__ is not float:
+                    intp.check_number_oprands(spans[ip], l, r)
+                if op == MULTIPLY:
+                    push(l * r)
+                elif op == DIVIDE:
+                    push(l / r)
+                elif op == GREATER:
+                    push(l > r)
+                elif op == GREATER_EQUAL:
+                    push(l >= r)
+                else:
+                    push(l <= r)
+
+            elif op == EQUAL:
+                r = pop()
+                push(pop() == r)
+
+            elif op == NOT_EQUAL:
+                r = pop()
+                push(pop() != r)
+
+            elif op == NIL:
+                push(None)
+
+            elif op == TRUE:
+                push(True)
+
+            elif op == FALSE:
+                push(False)
+
+            elif op == NOT:
+                push(not pop())
+
+            elif op == NEGATE:
+                r = pop()
+                if not isinstance(r, float):
+                    raise intp.error(spans[ip], f"expected Number got {type(r)}")
+                push(-r)
+
+            elif op == JUMP_IF_FALSE:
+                ip = ip + 1 if stack[-1] else code[ip]
+
+            elif op == JUMP_IF_TRUE:
+                ip = code[ip] if stack[-1] else ip + 1
+
+            elif op == SET_GLOBAL:
+                intp.globals.set(constants[code[ip]], stack[-1], spans[ip + 1])
+                ip += 1
+
+            elif op == DEFINE_GLOBAL:
+                globals_[constants[code[ip]]] = pop()
+                ip += 1
+
+            elif op == PRINT:
+                print(pop())
+
+            elif op == CLOSURE:
+                push(VMFunction(constants[code[ip]], env))
+                ip += 1
+
+            elif op == CLASS:
+                proto: ClassProto = constants[code[ip]]
+                ip += 1
+                methods = {m.name: VMFunction(m, env, m.is_init) for m in proto.methods}
+                static_methods = {m.name: VMFunction(m, env) for m in proto.static_methods}
+                push(NutClass(proto.name, methods, static_methods))
+
+            elif op == BREAK_OUTSIDE_LOOP:
+                # unwind to the nearest caller that made its call inside a loop, like
+                # the NutBreak the tree interpreter raises and visit_while_stmnt catches
+                span = spans[ip]
+                while True:
+                    if not frames:
+                        raise NutBreak(span)
+                    code, constants, spans, exits, ip, env, frame, function, stack = frames.pop()
+                    if (target := exits.get(ip)) is not None:
+                        break
+                ip, scopes = target
+                for _ in range(scopes):
+                    env = env.enclosing
+                # loops are statements, nothing of the caller's is left on its stack there
+                stack.clear()
+                push, pop = stack.append, stack.pop
+
+            else:
+                raise RuntimeError(f"[Internal] unknown opcode {op}")
+
+
+class VMInterpreter(Interpreter):
+    """Compiles each top-level statement to bytecode and runs it on the VM."""
+
+    def __init__(self, context: Context):
+        super().__init__(context)
+        self.vm = VM(self)
+
+    def execute(self, stmnt: at.Stmnt) -> None:
+        chunk = Compiler(self.context).compile([stmnt])
+        self.vm.run(chunk, self.globals)
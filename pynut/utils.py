@@ -1,19 +1,59 @@
-from dataclasses import dataclass
-from functools import wraps
-from pprint import pprint
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Optional
 
 
-@dataclass(unsafe_hash=True)
 class Span:
-    start: int
-    end: int
-    line: int
+    def __init__(self, start: int, end: int, line: int) -> None:
+        self.start = start
+        self.end = end
+        self.line = line
+
+    def __repr__(self) -> str:
+        return f"Span({self.start}, {self.end}, {self.line})"
+
+
+# what tokens and AST nodes hold instead of a Span, an index into a SpanTable
+SpanId = int
+
+
+class SpanTable:
+    """The start, end and line of every span of a program, packed in arrays.
+
+    Tokens and AST nodes keep the SpanId of their span, 12 bytes here instead
+    of a Span object each. A Span is only made for a span being reported.
+    """
+
+    def __init__(self) -> None:
+        self.starts = array("I")
+        self.ends = array("I")
+        self.lines = array("I")
+
+    def add(self, start: int, end: int, line: int) -> SpanId:
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+        return len(self.starts) - 1
+
+    def join(self, first: SpanId, last: SpanId) -> SpanId:
+        """A span from the start of first to the end of last."""
+        return self.add(self.starts[first], self.ends[last], self.lines[first])
+
+    def span(self, span: SpanId) -> Span:
+        return Span(self.starts[span], self.ends[span], self.lines[span])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
 
-@dataclass
 class Context:
-    source: str
-    file_name: str = "<stdin>"
-    has_error: bool = False
+    def __init__(self, source: str, file_name: str = "<stdin>", spans: Optional[SpanTable] = None) -> None:
+        self.source = source
+        self.file_name = file_name
+        self.has_error = False
+        self.spans = SpanTable() if spans is None else spans
+        self._line_starts: Optional[list[int]] = None
     
     def error(self, line: int, message: str) -> None:
         self.report(line, self.file_name, message)
@@ -23,30 +63,44 @@ class Context:
         self.has_error = True
 
 
-    def find_line_bounds_from_span(self, span: Span) -> tuple[int, int]:
-        # sourcery skip: move-assign-in-block, use-next
-        start = 0
-        end = len(self.source)
+    @property
+    def line_starts(self) -> list[int]:
+        """Offset of the first character of every line, built on first use."""
+        if self._line_starts is None:
+            self._line_starts = [0, *accumulate(len(line) + 1 for line in self.source.split("\n")[:-1])]
+        return self._line_starts
+
+    def line_of(self, offset: int) -> int:
+        """The 1-based line the character at offset is on."""
+        return bisect_right(self.line_starts, offset)
 
-        for i in range(span.start, 0, - 1):
-            if self.source[i] == '\n':
-                start = i + 1
-                break
+    def line_bounds(self, line: int) -> tuple[int, int]:
+        """Offsets of the first character of line and of the newline ending it."""
+        starts = self.line_starts
+        end = starts[line] - 1 if line < len(starts) else len(self.source)
+        return starts[line - 1], end
 
-        for i in range(span.end, len(self.source)):
-            if self.source[i] == '\n':
-                end = i
-                break
+    def position(self, offset: int) -> tuple[int, int]:
+        """1-based line and column of offset."""
+        line = self.line_of(offset)
+        return line, offset - self.line_starts[line - 1] + 1
 
-        return start, end
+    def line_text(self, line: int) -> str:
+        start, end = self.line_bounds(line)
+        return self.source[start:end]
+
+    def find_line_bounds_from_span(self, span: Span) -> tuple[int, int]:
+        """Start of the first and end of the last line span covers."""
+        return self.line_bounds(self.line_of(span.start))[0], self.line_bounds(self.line_of(span.end))[1]
 
-    def error_span(self, message: str, span: Span) -> None:
+    def error_span(self, message: str, span_id: SpanId) -> None:
+        span = self.spans.span(span_id)
         start, end = self.find_line_bounds_from_span(span)
         
         line = self.source[start: end]
         error_line = f"{' '*(span.start - start)}^{'~'*(span.end - span.start - 1)}^--- {message}\n"
         
-        print(f"Error at {self.file_name}:{span.line}:{span.start - start + 1}")
+        print(f"Error at {self.file_name}:{self.line_of(span.start)}:{span.start - start + 1}")
         print("  ",line)
         print("  ",error_line)
         self.has_error = True